@@ -1,8 +1,8 @@
-from asyncio.locks import Lock
+import asyncio
 from datetime import datetime, timedelta
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
-from fastapi import FastAPI, HTTPException, Depends, Request
+from fastapi import FastAPI, HTTPException, Depends, Request, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer
 from jose import jwt, JWTError
@@ -10,15 +10,12 @@ from jwt.exceptions import ExpiredSignatureError, InvalidTokenError
 from pydantic import BaseModel
 
 from credentials import JWT_SECRET_KEY
-from db.access import DBAccess
-from utils.load_params import load_params
+from db.access import DBAccess, PRO_REVIEW_BATCH_SIZE
+from db.async_access import AsyncDBAccess
 
 app = FastAPI()
 auth = HTTPBearer()
 
-params = load_params()
-lock = Lock()
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -28,6 +25,39 @@ app.add_middleware(
 )
 
 ALGORITHM = "HS256"  # Algorithm used for encoding/decoding the token
+MAX_PREFETCH = 20  # Maximum number of videos returned by /get_videos
+CLASSIFICATION_LABELS = ['Hamas', 'Fatah', 'Unaffiliated', 'Uncertain', 'Broken']
+MAX_BATCH_CLASSIFICATIONS = 200  # Maximum number of items accepted by /classify_videos
+PARAMS_MAX_AGE = 300  # Seconds clients may reuse /params_list before revalidating it
+PRO_REVIEW_INTERVAL = 2  # Seconds between pro review outbox checks when the outbox is drained
+
+
+async def process_pro_reviews():
+    """ Background worker: keeps draining the pro review outbox, waiting between checks once it's empty. """
+    while True:
+        try:
+            processed = await AsyncDBAccess().process_pro_review_outbox()
+        except Exception as e:
+            print(f"Pro review processing failed: {e}")
+            processed = 0
+        if processed < PRO_REVIEW_BATCH_SIZE:
+            await asyncio.sleep(PRO_REVIEW_INTERVAL)
+
+
+@app.on_event("startup")
+async def check_configuration():
+    """ Creates the database access before serving requests, so a misconfigured deploy fails to start. """
+    AsyncDBAccess()
+
+
+@app.on_event("startup")
+async def start_pro_review_worker():
+    app.state.pro_review_worker = asyncio.create_task(process_pro_reviews())
+
+
+@app.on_event("shutdown")
+async def stop_pro_review_worker():
+    app.state.pro_review_worker.cancel()
 
 
 def generate_token(user_id):
@@ -63,8 +93,8 @@ def extract_user_from_token(request: Request) -> Optional[dict]:
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token")
 
-        # Fetch user from the database
-        user = db.get_user_by_id(user_id)  # Assuming a method exists to fetch user by ID
+        # Fetch user from the cache, or the database on a miss
+        user = db.get_authenticated_user(user_id)
 
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
@@ -78,7 +108,7 @@ def extract_user_from_token(request: Request) -> Optional[dict]:
 
 
 # Dependency to extract the user from the token
-def get_current_user(request: Request):
+async def get_current_user(request: Request):
     auth_header = request.headers.get("Authorization")
     if not auth_header or not auth_header.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing or invalid authorization token")
@@ -90,8 +120,8 @@ def get_current_user(request: Request):
         if user_id is None:
             raise HTTPException(status_code=401, detail="Invalid token: no user_id")
 
-        db = DBAccess()  # Ensure your DBAccess class is set up properly
-        user = db.get_user_by_id(user_id)
+        db = AsyncDBAccess()
+        user = await db.get_authenticated_user(user_id)
         if user is None:
             raise HTTPException(status_code=401, detail="User not found")
 
@@ -102,41 +132,53 @@ def get_current_user(request: Request):
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
+# Dependency for endpoints that only pro users may call
+def get_current_pro_user(current_user = Depends(get_current_user)):
+    if not current_user.is_pro:
+        raise HTTPException(status_code=403, detail="Pro user required")
+    return current_user
+
+
 class User(BaseModel):
     password: str
 
 
 @app.post("/auth/signin")
 async def signin(user: User):
-    db = DBAccess()
+    db = AsyncDBAccess()
     user = user.password
-    user = db.validate_user(user)
+    user = await db.validate_user(user)
     if user is None:
         raise HTTPException(status_code=401, detail="Unauthorized")
     token = generate_token(user.id)
 
-    return {'user_id':user.id,'token': token, 'is_pro': user.id in db.get_pro_users()}
+    return {'user_id':user.id,'token': token, 'is_pro': user.is_pro}
 
 
 @app.get("/get_video")
 async def get_video(current_user = Depends(get_current_user)):
     user_id = current_user.id
 
-    async with lock:
-        db = DBAccess()
-        video = db.get_video_for_user(user_id)
-
-    if video is not None:
-        username = db.get_uploader_username(video.id)
-        return {
-            'id': str(video.id),
-            'uploader': username,
-            'file': video.video_file,
-            'description': video.description,
-            'web_url': video.web_url
-        }
+    db = AsyncDBAccess()
+    videos = await db.get_videos_for_user(user_id, 1)
+
+    if videos:
+        return videos[0]
     else:
         return {'error': 'No unclassified videos'}
+
+
+@app.get("/get_videos")
+async def get_videos(count: int = Query(5, ge=1, le=MAX_PREFETCH), current_user = Depends(get_current_user)):
+    """
+    Returns up to `count` upcoming videos for the user, so the client can preload them.
+    """
+    user_id = current_user.id
+
+    db = AsyncDBAccess()
+    videos = await db.get_videos_for_user(user_id, count)
+
+    return {'videos': videos}
     
 
 class Classification(BaseModel):
@@ -149,105 +191,104 @@ class Classification(BaseModel):
 @app.post("/classify_video")
 async def classify_video( classification: Classification, current_user = Depends(get_current_user)):
     user_id = current_user.id
-    db = DBAccess()
-    video = db.get_video_by_id(classification.video_id)
-    if video is not None:
-        if classification.classification not in ['Hamas', 'Fatah', 'Unaffiliated', 'Uncertain', 'Broken']:
-            return {'error': 'Invalid classification'}
-        async with lock:
-            result = db.classify_video(classification.video_id, user_id, classification.classification,
-                                       classification.features, classification.duration)
-        return {'classified': result}
-    else:
-        return {'error': 'No such video'}
+    db = AsyncDBAccess()
+    if classification.classification not in CLASSIFICATION_LABELS:
+        return {'error': 'Invalid classification'}
+    try:
+        # Also checks that the video exists, in the same transaction
+        result = await db.classify_video(classification.video_id, user_id, classification.classification,
+                                         classification.features, classification.duration)
+    except ValueError as e:
+        return {'error': str(e)}
+    return {'classified': result}
+
+
+@app.post("/classify_videos")
+async def classify_videos(classifications: List[Classification], current_user = Depends(get_current_user)):
+    """
+    Applies a batch of classifications in one transaction, e.g. ones queued by a client while offline.
+    Returns a result per item, in the order they were sent.
+    """
+    user_id = current_user.id
+    if len(classifications) > MAX_BATCH_CLASSIFICATIONS:
+        return {'error': f'At most {MAX_BATCH_CLASSIFICATIONS} classifications per batch'}
+
+    results = [None] * len(classifications)
+    valid = []
+    for index, classification in enumerate(classifications):
+        if classification.classification not in CLASSIFICATION_LABELS:
+            results[index] = {'video_id': classification.video_id, 'error': 'Invalid classification'}
+        else:
+            valid.append(index)
+
+    db = AsyncDBAccess()
+    batch_results = await db.classify_videos(user_id, [classifications[index].dict() for index in valid])
+    for index, result in zip(valid, batch_results):
+        results[index] = result
+
+    return {'results': results}
 
 
 @app.get("/count_classifications")
 async def count_classifications(current_user = Depends(get_current_user)):
     user_id = current_user.id
-    db = DBAccess()
-    classifications_done= db.get_num_classifications(user_id)
-    classifications_left = db.get_num_remaining_classifications(user_id)
-    return {"done": classifications_done, "left": classifications_left}
+    db = AsyncDBAccess()
+    stats = await db.get_user_stats(user_id)
+    return {"done": stats["total"], "left": stats["remain"]}
 
 @app.get("/get_user_panel")
 async def get_user_panel(current_user = Depends(get_current_user)):
     user_id = current_user.id
-    async with lock:
-        db = DBAccess()
-        num_classified = db.get_num_classifications(user_id)
-        num_fatah = db.get_num_fatah_by_user(user_id)
-        num_hamas = db.get_num_hamas_by_user(user_id)
-        num_unaffiliated = db.get_num_unaffiliated_by_user(user_id)
-        num_uncertain = db.get_num_uncertain_by_user(user_id)
-        num_remain = db.get_num_remaining_classifications(user_id)
-
-    if num_classified is not None:
-        return {'total': num_classified,
-                'fatah': num_fatah,
-                'hamas': num_hamas,
-                'unaffiliated': num_unaffiliated,
-                'uncertain': num_uncertain,
-                'remain': num_remain}
+    db = AsyncDBAccess()
+    # All counts come from the maintained counters in one query
+    stats = await db.get_user_stats(user_id)
+
+    if stats is not None:
+        return stats
     else:
         return {'error': 'Error getting user data'}
 
 
 @app.get("/get_pro_panel")
 async def get_pro_panel():
-    users = []
-    async with lock:
-        db = DBAccess()
-        user_data = db.get_all_users()
-        num_tot = db.get_total_classifications()
-        tot_fatah = db.get_total_fatah_classifications()
-        tot_hamas = db.get_total_hamas_classifications()
-        tot_unaffiliated = db.get_total_unaffiliated_classifications()
-        tot_uncertain = db.get_total_uncertain_classifications()
-        tot_duration = db.get_total_avg_duration()
-
-
-        for user in user_data:
-            curr_user = user.id
-            email = user.email
-            num_classified = db.get_num_classifications(curr_user)
-            num_fatah = db.get_num_fatah_by_user(curr_user)
-            num_hamas = db.get_num_hamas_by_user(curr_user)
-            num_unaffiliated = db.get_num_unaffiliated_by_user(curr_user)
-            num_uncertain = db.get_num_uncertain_by_user(curr_user)
-            avg_duration = db.get_avg_duration_by_user(curr_user)
-
-            if num_classified is not None:
-
-                # Append user data to the list
-                users.append({
-                    "email": email,
-                    "personalClassifications": num_classified,
-                    "fatahClassified": num_fatah,
-                    "hamasClassified": num_hamas,
-                    "unaffiliatedClassified":num_unaffiliated,
-                    "uncertainClassified": num_uncertain,
-                    "avgDuration": round(avg_duration, 2) if avg_duration is not None else "N/A"
-                })
-            else:
-                # Handle error case if data retrieval fails for the user
-                users.append({
-                    "email": email,
-                    "error": "Error getting user data"
-                })
-
-    return {"users": users,
-            "total": num_tot,
-            "total_hamas": tot_hamas,
-            "total_fatah": tot_fatah,
-            "total_unaffiliated": tot_unaffiliated,
-            "total_uncertain": tot_uncertain,
-            "total_duration": round(tot_duration, 2) if tot_duration is not None else "N/A"}
+    db = AsyncDBAccess()
+    # Per-user and global counts come from the maintained counters in two queries
+    return await db.get_pro_dashboard()
+
+
+@app.get("/cache_stats")
+async def cache_stats(current_user = Depends(get_current_pro_user)):
+    db = AsyncDBAccess()
+    return {"users": db.user_cache.stats(), "agreement": db.agreement_cache.stats()}
+
+
+@app.get("/agreement")
+async def agreement(current_user = Depends(get_current_pro_user)):
+    return await AsyncDBAccess().get_agreement_stats()
+
+
+@app.get("/pool_stats")
+async def pool_stats(current_user = Depends(get_current_pro_user)):
+    # Reads in-memory pool counters only, so it stays responsive when every connection is busy
+    db = DBAccess()
+    return db.get_pool_stats()
 
 
 @app.get("/params_list")
-async def params_list():
-    return params
+async def params_list(request: Request, response: Response):
+    features = await AsyncDBAccess().get_feature_snapshot()
+    headers = {"ETag": features.etag, "Cache-Control": f"public, max-age={PARAMS_MAX_AGE}"}
+    if request.headers.get("if-none-match") == features.etag:
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return features.params
+
+
+@app.post("/reload_features")
+async def reload_features(current_user = Depends(get_current_pro_user)):
+    # Reloads this worker's feature catalog now; the other workers pick the change up within CATALOG_TTL seconds
+    return {"features": await AsyncDBAccess().reload_feature_catalog()}
 
 
 if __name__ == '__main__':
@@ -1,8 +1,8 @@
-# from dotenv import load_dotenv
-# import os
-# 
-# load_dotenv()
-# 
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
 # DB = f"postgresql://{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT', '5432')}/{os.getenv('DB_NAME')}"
 
 
@@ -10,3 +10,17 @@ DB = "postgresql://ua4jgfqh0bedbj:p0ac6647acc7715da9329aeb119c6f16424640b0c320b9
 
 JWT_SECRET_KEY = "my secret key"
 
+ACCESS_CODE_KEY = os.getenv('ACCESS_CODE_KEY')  # Key for the indexed HMAC of users' access codes, required
+
+# Connection pool of each worker's engine. With 3 gunicorn workers the database sees up to
+# 3 * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))  # Connections kept open
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))  # Extra connections opened under load
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))  # Seconds to wait for a free connection
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))  # Seconds before a connection is replaced
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'  # Test connections before use
+DB_POOL_SLOW_CHECKOUT = float(os.getenv('DB_POOL_SLOW_CHECKOUT', '1'))  # Seconds after which a checkout is logged
+
+# How final_labels resolves a video's label: 'pro-override' (a pro user's label wins, otherwise the majority)
+# or 'majority' (every classification is one vote). After changing it, run: python -m utils.rebuild_final_labels
+FINAL_LABEL_RULE = os.getenv('FINAL_LABEL_RULE', 'pro-override')
@@ -1,13 +1,50 @@
+import hashlib
+import hmac
 import random
 import re
+from collections import namedtuple
 from datetime import datetime, timedelta
 from secrets import token_urlsafe
-from sqlalchemy import Engine, update, func, desc, case
+
+import bcrypt
+from sqlalchemy import Engine, update, func, case, delete, insert, literal, text
 from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import aggregate_order_by, insert as pg_insert
 from sqlalchemy.orm import Session, aliased
 
 from credentials import *
+from db.agreement import agreement_stats
+from db.assignment import AssignmentPool, AssignmentOptions, STRATEGIES, group_plan_by_user, print_plan_summary
+from db.cache import TTLCache
+from db.features import FeatureCatalog, feature_bit, feature_mask
 from db.models import *
+from db.pool import TimedQueuePool
+
+USER_CACHE_SIZE = 1024  # Maximum number of authenticated users kept in memory
+USER_CACHE_TTL = 300  # Seconds before a cached user is looked up again
+AGREEMENT_CACHE_TTL = 60  # Seconds the /agreement statistics are served from memory
+PRO_REVIEW_BATCH_SIZE = 200  # Outbox entries checked per process_pro_review_outbox call
+EXPORT_CHUNK_SIZE = 5000  # Rows fetched at a time when streaming exports
+FINAL_LABEL_RULES = ("pro-override", "majority")  # Supported values of FINAL_LABEL_RULE
+
+# A video's final classification with its features and metadata, as exported by get_final_classifications_with_metadata
+FinalClassification = namedtuple("FinalClassification",
+                                 ["video_id", "final_classification", "features", "music_id", "username", "description"])
+# The identity and pro status of a signed-in user, as cached by DBAccess.get_authenticated_user
+AuthenticatedUser = namedtuple("AuthenticatedUser", ["id", "email", "is_pro"])
+
+def access_code_lookup_key(password):
+    """
+    Returns the keyed hash used to look a user up by their access code.
+    Unlike the bcrypt hash it is deterministic, so it can be indexed.
+    """
+    return hmac.new(ACCESS_CODE_KEY.encode(), password.encode(), hashlib.sha256).hexdigest()
+
+
+def hash_access_code(password):
+    """ Returns the bcrypt hash stored to verify an access code. """
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+
 
 class Singleton(type):
     def __init__(cls, name, bases, dict):
@@ -22,7 +59,25 @@ class Singleton(type):
 
 class DBAccess(metaclass=Singleton):
     def __init__(self):
-        self.engine: Engine = create_engine(DB)
+        # Fail at startup rather than on the first sign-in or in the background outbox worker
+        if not ACCESS_CODE_KEY:
+            raise ValueError("The ACCESS_CODE_KEY environment variable must be set.")
+        if FINAL_LABEL_RULE not in FINAL_LABEL_RULES:
+            raise ValueError(f"Unknown final label rule '{FINAL_LABEL_RULE}', expected one of {FINAL_LABEL_RULES}.")
+
+        self.engine: Engine = create_engine(
+            DB,
+            poolclass=TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING
+        )
+        self.engine.pool.slow_checkout = DB_POOL_SLOW_CHECKOUT
+        self.user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+        self.agreement_cache = TTLCache(maxsize=1, ttl=AGREEMENT_CACHE_TTL)
+        self.feature_catalog = FeatureCatalog(self.engine)  # Loaded on first use
 
     def add_user(self, email, password):
         """
@@ -31,16 +86,18 @@ class DBAccess(metaclass=Singleton):
         with Session(self.engine) as session:
             user = User(
                 email=email,
-                password=password
+                password_lookup=access_code_lookup_key(password),
+                password_hash=hash_access_code(password)
             )
             session.add(user)
             session.commit()
             session.refresh(user)
+            self.user_cache.invalidate(user.id)
 
             return {
                 "id": user.id,
                 "email": user.email,
-                "password": user.password
+                "password": password
             }
 
     def add_pro_user(self, user_id):
@@ -57,6 +114,7 @@ class DBAccess(metaclass=Singleton):
             pro_user = ProUser(id=user_id)
             session.add(pro_user)
             session.commit()
+            self.user_cache.invalidate(user_id)
             return {"id": pro_user.id}
 
     def get_user_by_email(self, email):
@@ -74,16 +132,76 @@ class DBAccess(metaclass=Singleton):
             user = session.query(User).filter(User.id == user_id).one_or_none()
             return user
 
+    def get_pool_stats(self):
+        """
+        Returns the connection pool's current usage and checkout wait times.
+        """
+        return self.engine.pool.stats()
+
+    def get_authenticated_user(self, user_id):
+        """
+        Retrieves a user's identity and pro status, served from an in-process TTL cache when possible.
+        On a miss, both are loaded with a single joined query.
+        Returns an AuthenticatedUser, or None if the user doesn't exist.
+        """
+        user = self.user_cache.get(user_id)
+        if user is not None:
+            return user
+
+        return self.load_authenticated_user(user_id)
+
+    def load_authenticated_user(self, user_id):
+        """
+        Loads a user's identity and pro status from the database with a single joined query, and caches it.
+        Returns an AuthenticatedUser, or None if the user doesn't exist.
+        """
+        with Session(self.engine) as session:
+            row = session.query(User.id, User.email, ProUser.id.isnot(None)).outerjoin(
+                ProUser, ProUser.id == User.id
+            ).filter(User.id == user_id).one_or_none()
+
+        if row is None:
+            return None
+
+        user = AuthenticatedUser(*row)
+        self.user_cache.set(user_id, user)
+        return user
+
     def validate_user(self, password):
         """
         Validates a user by password.
-        Returns the user object if valid, otherwise None.
+        Finds the candidate through the indexed lookup key, with its pro status joined in,
+        and verifies the password against the bcrypt hash.
+        Returns an AuthenticatedUser if valid, otherwise None.
         """
         with Session(self.engine) as session:
-            # Find the first user with this password
-            user = session.query(User).filter(User.password == password).first()
+            candidates = session.query(User.id, User.email, User.password_hash, ProUser.id.isnot(None)).outerjoin(
+                ProUser, ProUser.id == User.id
+            ).filter(User.password_lookup == access_code_lookup_key(password)).order_by(User.id).all()
 
-            return user  # Returns None if no user is found
+        for user_id, email, password_hash, is_pro in candidates:
+            if password_hash and bcrypt.checkpw(password.encode(), password_hash.encode()):
+                user = AuthenticatedUser(user_id, email, is_pro)
+                self.user_cache.set(user_id, user)
+                return user
+
+        return None  # No user has this password
+
+    def migrate_password_hashes(self):
+        """
+        Hashes the plaintext access codes of users created before hashed credentials, and clears the plaintext.
+        Users that are already migrated are left untouched, so this is safe to run more than once.
+        """
+        with Session(self.engine) as session:
+            users = session.query(User).filter(User.password_hash == None, User.password != None).all()
+
+            for user in users:
+                user.password_lookup = access_code_lookup_key(user.password)
+                user.password_hash = hash_access_code(user.password)
+                user.password = None
+
+            session.commit()
+            print(f"Hashed the access codes of {len(users)} users.")
 
     # Returns all users
     def get_all_users(self):
@@ -116,381 +234,597 @@ class DBAccess(metaclass=Singleton):
         with Session(self.engine) as session:
             return session.query(VideoMeta).filter(VideoMeta.id == video_id).one_or_none()
 
-    def get_video_for_user(self, user_id):
+    def get_videos_for_user(self, user_id, limit=1):
         """
-        Retrieves a video assigned to the user that is still unclassified.
-        If the user has no assigned videos left, return None.
+        Retrieves up to `limit` unclassified videos assigned to the user, with the uploader's username
+        joined in the same query, so clients can preload upcoming videos.
+        Returns a list of dicts shaped like the /get_video response.
         """
 
         with Session(self.engine) as session:
-            # Fetch an unclassified video assigned to this user
-            video_entry = session.query(VideoMeta).join(
+            open_videos = session.query(
+                VideoMeta.id,
+                VideoMeta.video_file,
+                VideoMeta.description,
+                VideoMeta.web_url,
+                TiktokUser.username
+            ).join(
                 VideoClassification, VideoMeta.id == VideoClassification.video_id
+            ).outerjoin(
+                TiktokUser, TiktokUser.id == VideoMeta.user_id
             ).filter(
                 VideoClassification.classified_by == user_id,
                 VideoClassification.classification == "N/A"
-            ).order_by(func.random()).first()  # Pick a random assigned video
+            )
+            rows = self.pick_from_work_queue(open_videos, limit)
 
-            if not video_entry:
-                print(f"No unclassified videos left for user {user_id}.")
-                return None
+        return [{
+            'id': str(row.id),
+            'uploader': row.username or "unknown",
+            'file': row.video_file,
+            'description': row.description,
+            'web_url': row.web_url
+        } for row in rows]
 
-            # Fully load attributes before session closes
-            _ = video_entry.id, video_entry.video_file, video_entry.description
-            return video_entry
+    def pick_from_work_queue(self, open_videos, limit):
+        """
+        Takes up to `limit` rows from a query over a user's open VideoClassification rows, in queue order
+        starting from a random position and wrapping around to the beginning of the queue.
+        Each part is an index range scan on the partial open-queue index instead of a sort of the whole backlog.
+        The rows aren't locked: each open row belongs to a single user, and classify_videos only classifies it
+        while it is still open, so a repeated pick of the same video can't be classified twice.
+        """
+        offset = random.random()
+        open_videos = open_videos.order_by(VideoClassification.queue_position)
+
+        rows = open_videos.filter(VideoClassification.queue_position >= offset).limit(limit).all()
+        if len(rows) < limit:
+            rows += open_videos.filter(VideoClassification.queue_position < offset).limit(limit - len(rows)).all()
+        return rows
 
-    def assign_videos_to_users(self, max_videos_per_user=10):
+    def assign_videos_to_users(self, max_videos_per_user=10, dry_run=False):
         """
         Assigns videos randomly to non-pro users while ensuring:
         - Each video is assigned to exactly 2 users (if possible).
         - Each user gets assigned up to `max_videos_per_user`.
         - If needed, some videos are assigned to only 1 user to reach max limit per user.
         """
+        user_video_map = self.run_assignment_strategy(
+            "random-2-way", AssignmentOptions(quota=max_videos_per_user), dry_run
+        )
+        print(f"Assigned videos. Each user received up to {max_videos_per_user} videos.")
+        return user_video_map  # Optional debug output
 
-        with Session(self.engine) as session:
-            # Fetch videos that are assigned to less than 2 users
-            partially_assigned_videos = session.query(VideoMeta.id).outerjoin(
-                VideoClassification, VideoMeta.id == VideoClassification.video_id
-            ).group_by(VideoMeta.id).having(func.count(VideoClassification.video_id) < 2).all()
-
-            partially_assigned_videos = [v[0] for v in partially_assigned_videos]
-            random.shuffle(partially_assigned_videos)  # Shuffle video order
-
-            # Get all non-pro users
-            non_pro_users = session.query(User.id).filter(
-                ~User.id.in_(session.query(ProUser.id))
-            ).all()
-
-            non_pro_users = [u[0] for u in non_pro_users]
-            random.shuffle(non_pro_users)  # Shuffle users for fairness
-
-            # Track user assignments
-            user_video_count = {user: 0 for user in non_pro_users}
-            user_video_map = {user: [] for user in non_pro_users}
-
-            assigned_videos = set()  # Track videos fully assigned
-
-            # Assign videos to users
-            for video_id in partially_assigned_videos:
-                assigned_count = session.query(VideoClassification).filter(
-                    VideoClassification.video_id == video_id
-                ).count()
-
-                if assigned_count >= 2:
-                    continue  # Skip already fully assigned videos
-
-                # Get eligible users who need more videos
-                eligible_users = [u for u in non_pro_users if user_video_count[u] < max_videos_per_user]
-
-                if not eligible_users:
-                    break  # Stop if no users need more videos
-
-                # Choose up to 2 users (but ensure no video goes over 2 assignments)
-                selected_users = random.sample(eligible_users, min(2 - assigned_count, len(eligible_users)))
-
-                for user_id in selected_users:
-                    session.add(VideoClassification(video_id=video_id, classified_by=user_id, classification="N/A"))
-                    user_video_map[user_id].append(video_id)
-                    user_video_count[user_id] += 1
-
-                # Mark video as fully assigned if it reached 2 users
-                if session.query(VideoClassification).filter(VideoClassification.video_id == video_id).count() == 2:
-                    assigned_videos.add(video_id)
-
-            # Ensure every user gets `max_videos_per_user' videos
-            remaining_users = [u for u in non_pro_users if user_video_count[u] < max_videos_per_user]
-            unassigned_videos = [v for v in partially_assigned_videos if v not in assigned_videos]
-            random.shuffle(unassigned_videos)
-
-            while remaining_users and unassigned_videos:
-                for user in remaining_users:
-                    if user_video_count[user] >= max_videos_per_user:
-                        continue  # Skip users who reached max quota
-
-                    if not unassigned_videos:
-                        break  # Stop if there are no videos left
-
-                    video_id = unassigned_videos.pop()
-                    session.add(VideoClassification(video_id=video_id, classified_by=user, classification="N/A"))
-                    user_video_map[user].append(video_id)
-                    user_video_count[user] += 1
-
-                    if user_video_count[user] >= max_videos_per_user:
-                        remaining_users.remove(user)
-
-            session.commit()
-            print(f"Assigned videos. Each user received up to {max_videos_per_user} videos.")
-            return user_video_map  # Optional debug output
-
-    def assign_videos_prioritizing_hamas(self, max_videos_per_user=200, prioritized_video_limit=500):
+    def assign_videos_prioritizing_hamas(self, max_videos_per_user=200, prioritized_video_limit=500, dry_run=False):
         """
         Assigns videos to non-pro users by first prioritizing videos from 'hamas' users, and then randomly.
         Each user receives up to `max_videos_per_user` videos total.
         """
+        user_video_map = self.run_assignment_strategy("priority-by-pre-class", AssignmentOptions(
+            quota=max_videos_per_user, pre_class="hamas", limit=prioritized_video_limit
+        ), dry_run)
+        print(f"Assigned videos with priority. Each user received up to {max_videos_per_user} videos.")
+        return user_video_map
 
-        with Session(self.engine) as session:
-            # Step 1: Get prioritized videos (from users pre-classified as 'hamas' and not yet classified)
-            prioritized_videos = session.query(VideoMeta.id).join(TiktokUser).filter(
-                TiktokUser.pre_classification == 'hamas',
-                ~VideoMeta.id.in_(session.query(VideoClassification.video_id))
-            ).limit(prioritized_video_limit).all()
-            prioritized_videos = [v[0] for v in prioritized_videos]
-
-            # Step 2: Get all other videos that are not yet assigned and not part of the prioritized list
-            all_other_videos = session.query(VideoMeta.id).filter(
-                ~VideoMeta.id.in_(session.query(VideoClassification.video_id)),  # Exclude already classified
-                ~VideoMeta.id.in_(prioritized_videos)  # Exclude already selected prioritized ones
-            ).all()
-            all_other_videos = [v[0] for v in all_other_videos]
-            random.shuffle(all_other_videos)
-
-            # Step 3: Get all non-pro users
-            non_pro_users = session.query(User.id).filter(
-                ~User.id.in_(session.query(ProUser.id))
-            ).all()
-            non_pro_users = [u[0] for u in non_pro_users]
-            random.shuffle(non_pro_users)
-
-            # Step 4: Track user assignments
-            user_video_count = {user: 0 for user in non_pro_users}
-            user_video_map = {user: [] for user in non_pro_users}
-
-            def assign_videos_from_list(video_list):
-                for video_id in video_list:
-                    assigned_count = session.query(VideoClassification).filter(
-                        VideoClassification.video_id == video_id
-                    ).count()
-                    if assigned_count >= 2:
-                        continue
-
-                    eligible_users = [u for u in non_pro_users if user_video_count[u] < max_videos_per_user]
-                    if not eligible_users:
-                        break
+    def assign_remaining_hamas_videos(self, exclude_user_ids=None, dry_run=False):
+        """
+        Assigns all remaining 'hamas' videos (not yet classified) evenly among non-pro users,
+        excluding any user IDs in `exclude_user_ids`.
 
-                    selected_users = random.sample(eligible_users, min(2 - assigned_count, len(eligible_users)))
+        Each video is assigned to exactly TWO different users.
+        """
+        if exclude_user_ids is None:
+            exclude_user_ids = []
 
-                    for user_id in selected_users:
-                        if user_video_count[user_id] >= max_videos_per_user:
-                            continue
+        user_video_map = self.run_assignment_strategy("round-robin", AssignmentOptions(
+            pre_class="hamas", exclude=tuple(exclude_user_ids)
+        ), dry_run)
+        print(f"Evenly assigned Hamas videos (each to two users) among non-pro users (excluding {exclude_user_ids}).")
+        return user_video_map
 
-                        session.add(VideoClassification(
-                            video_id=video_id, classified_by=user_id, classification="N/A"
-                        ))
-                        user_video_map[user_id].append(video_id)
-                        user_video_count[user_id] += 1
+    def run_assignment_strategy(self, strategy, options, dry_run=False):
+        """
+        Runs an assignment round: loads the assignment pool once, plans it with the named strategy
+        from db.assignment.STRATEGIES, and writes the plan with a single bulk insert.
+        With `dry_run`, the plan is only summarized and nothing is written.
+        Returns a map of user id to the video ids assigned to them.
+        """
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown assignment strategy '{strategy}'. Choose one of: {', '.join(STRATEGIES)}.")
 
-            # Step 5: Assign prioritized videos first
-            assign_videos_from_list(prioritized_videos)
+        with Session(self.engine) as session:
+            pool = self.load_assignment_pool(session)
+            plan = STRATEGIES[strategy](pool, options)
 
-            # Step 6: Assign remaining videos until each user reaches the max limit
-            assign_videos_from_list(all_other_videos)
+            if not dry_run:
+                self.write_assignment_plan(session, plan)
+                session.commit()
 
-            session.commit()
-            print(f"Assigned videos with priority. Each user received up to {max_videos_per_user} videos.")
-            return user_video_map
+            print_plan_summary(plan, pool.users, dry_run)
+            return group_plan_by_user(plan, pool.users)
 
-    def assign_remaining_hamas_videos(self, exclude_user_ids=None):
+    def load_assignment_pool(self, session):
         """
-        Assigns all remaining 'hamas' videos (not yet classified) evenly among non-pro users,
-        excluding any user IDs in `exclude_user_ids`.
-
-        Each video is assigned to exactly TWO different users.
+        Loads the inputs of an assignment round into an AssignmentPool: the videos assigned to fewer than
+        two users, the non-pro users, and each user's number of open assignments from the counters.
         """
+        non_pro_users = [u[0] for u in session.query(User.id).filter(
+            ~User.id.in_(session.query(ProUser.id))
+        ).all()]
 
-        if exclude_user_ids is None:
-            exclude_user_ids = []
+        workloads = dict(session.query(ClassificationCounter.user_id, ClassificationCounter.num).filter(
+            ClassificationCounter.classification == "N/A"
+        ).all())
 
-        with Session(self.engine) as session:
-            # Step 1: Get remaining 'hamas' videos (not yet classified)
-            hamas_videos = session.query(VideoMeta.id).join(TiktokUser).filter(
-                TiktokUser.pre_classification == 'hamas',
-                ~VideoMeta.id.in_(session.query(VideoClassification.video_id))
-            ).all()
-            hamas_videos = [v[0] for v in hamas_videos]
-            random.shuffle(hamas_videos)
+        return AssignmentPool(self.get_assignment_candidates(session), non_pro_users, workloads)
 
-            # Step 2: Get eligible non-pro users, excluding specified ones
-            non_pro_users = session.query(User.id).filter(
-                ~User.id.in_(session.query(ProUser.id)),
-                ~User.id.in_(exclude_user_ids)
-            ).all()
-            non_pro_users = [u[0] for u in non_pro_users]
-            random.shuffle(non_pro_users)
-
-            if len(non_pro_users) < 2:
-                print("Not enough users to assign each video to two users.")
-                return {}
-
-            # Step 3: Prepare user assignment map
-            user_video_map = {user: [] for user in non_pro_users}
-            user_count = len(non_pro_users)
-
-            # Step 4: Assign each video to two different users
-            for idx, video_id in enumerate(hamas_videos):
-                # Pick two different users using round-robin
-                first_user = non_pro_users[(2 * idx) % user_count]
-                second_user = non_pro_users[(2 * idx + 1) % user_count]
-
-                # Assign to first user
-                session.add(VideoClassification(
-                    video_id=video_id,
-                    classified_by=first_user,
-                    classification="N/A"
-                ))
-                user_video_map[first_user].append(video_id)
-
-                # Assign to second user
-                session.add(VideoClassification(
-                    video_id=video_id,
-                    classified_by=second_user,
-                    classification="N/A"
-                ))
-                user_video_map[second_user].append(video_id)
+    def get_assignment_candidates(self, session):
+        """
+        Returns every video assigned to fewer than two users, as (video_id, assigned_user_ids, pre_classification)
+        where pre_classification is the uploader's, using one grouped query.
+        """
+        return session.query(
+            VideoMeta.id,
+            func.array_remove(func.array_agg(VideoClassification.classified_by), None),
+            TiktokUser.pre_classification
+        ).outerjoin(
+            VideoClassification, VideoMeta.id == VideoClassification.video_id
+        ).outerjoin(
+            TiktokUser, TiktokUser.id == VideoMeta.user_id
+        ).group_by(
+            VideoMeta.id, TiktokUser.pre_classification
+        ).having(func.count(VideoClassification.id) < 2).all()
+
+    def write_assignment_plan(self, session, plan):
+        """
+        Inserts the planned (video_id, user_id) assignments as 'N/A' classifications with a single
+        INSERT ... SELECT FROM unnest(...) statement, and updates the counters, within the caller's transaction.
+        """
+        if not plan:
+            return
 
-            session.commit()
-            print(
-                f"Evenly assigned {len(hamas_videos)} Hamas videos (each to two users) among {len(non_pro_users)} users (excluding {exclude_user_ids}).")
-            print("\nAssignment summary:")
-            for user_id, videos in user_video_map.items():
-                print(f"User {user_id}: {len(videos)} videos")
+        video_ids, user_ids = zip(*plan)
+        session.execute(text("""
+            INSERT INTO videosclassification (video_id, classified_by, classification)
+            SELECT video_id, classified_by, 'N/A'
+            FROM unnest(CAST(:video_ids AS BIGINT[]), CAST(:user_ids AS INTEGER[])) AS plan(video_id, classified_by)
+        """), {"video_ids": list(video_ids), "user_ids": list(user_ids)})
 
-            return user_video_map
+        new_assignments = {}
+        for user_id in user_ids:
+            new_assignments[(user_id, "N/A")] = new_assignments.get((user_id, "N/A"), 0) + 1
+        self.update_user_counters(session, new_assignments)
 
     def classify_video(self, video_id, user_id, classification, features, duration):
         """
         Updates an existing 'N/A' classification record with the user's classification.
-        Also saves selected features and checks if a pro review is needed.
+        Also saves selected features and queues the video for the pro review check.
         If classified as 'broken', move the video to broken_videos and remove its classification entry.
+        Raises a ValueError if the video doesn't exist or the user has no open classification for it.
         """
-        with Session(self.engine) as session:
-            # Ensure the video exists
-            video = session.query(VideoMeta).filter(VideoMeta.id == video_id).one_or_none()
-            if not video:
-                raise ValueError(f"Video {video_id} does not exist.")
-
-            # Find the user's existing classification entry for this video
-            classification_entry = session.query(VideoClassification).filter(
-                VideoClassification.video_id == video_id,
-                VideoClassification.classified_by == user_id,
-                VideoClassification.classification == "N/A"
-            ).one_or_none()
-
-            if not classification_entry:
-                raise ValueError(f"User {user_id} does not have an open classification for Video {video_id}.")
+        result = self.classify_videos(user_id, [{
+            "video_id": video_id,
+            "classification": classification,
+            "features": features,
+            "duration": duration
+        }])[0]
+
+        if "error" in result:
+            raise ValueError(result["error"])
+        return result["classified"]
+
+    def classify_videos(self, user_id, classifications):
+        """
+        Applies a batch of the user's classifications in one transaction.
+        `classifications` is a list of dicts with video_id, classification, features and duration.
+        Each item updates the user's 'N/A' record for the video, saves its selected features, or for 'broken'
+        moves the video to broken_videos and removes the record. Classified videos are queued in ProReviewOutbox,
+        once per video, for the background pro review check and final label refresh.
+        The transaction makes one locking read of the videos' classifications, one conditional statement
+        per item, one bulk insert of features, the counter updates and a single commit.
+        Concurrency is handled by the database, so this is safe to call from any number of workers.
+        Returns one result per item, in order: {"video_id", "classified"} on success, otherwise {"video_id", "error"}.
+        """
+        results = [None] * len(classifications)
+
+        # Validate the video ids and features before touching the database
+        pending = []
+        for index, item in enumerate(classifications):
+            try:
+                video_id = int(item["video_id"])
+                feature_ids = self.feature_catalog.selected_ids(item.get("features"))
+            except ValueError as e:
+                results[index] = {"video_id": str(item["video_id"]), "error": str(e)}
+                continue
+            pending.append((index, video_id, item["classification"], feature_ids, item.get("duration")))
+
+        if not pending:
+            return results
 
-            # If classified as 'broken', move the video to broken_videos and delete classification entry
-            if classification.lower() == "broken":
-                # Check if this user has already classified this video as broken
-                broken_entry = session.query(BrokenVideos).filter(
-                    BrokenVideos.video_id == video_id,
-                    BrokenVideos.classified_by == user_id
-                ).one_or_none()
+        with Session(self.engine) as session:
+            # Lock the videos and read all their classifications. Classifications of the same video run one after
+            # the other, so the counters always see the other classifications' results.
+            # Locking in id order avoids deadlocks on the videos between batches; the counter rows are
+            # upserted in key order by update_user_counters and update_video_counters for the same reason.
+            rows = session.query(
+                VideoMeta.id,
+                VideoClassification.classification,
+                VideoClassification.classified_by
+            ).outerjoin(
+                VideoClassification, VideoClassification.video_id == VideoMeta.id
+            ).filter(
+                VideoMeta.id.in_({video_id for _, video_id, _, _, _ in pending})
+            ).order_by(VideoMeta.id).with_for_update(of=VideoMeta).all()
 
-                if not broken_entry:
-                    session.add(BrokenVideos(video_id=video_id, classified_by=user_id))  # Insert into broken_videos
+            # Per video: the labels it has and the user's open records
+            labels = {}
+            open_entries = {}
+            for row in rows:
+                labels.setdefault(row.id, set())
+                open_entries.setdefault(row.id, 0)
+                if row.classification not in (None, "N/A"):
+                    labels[row.id].add(row.classification)
+                elif row.classification == "N/A":
+                    open_entries[row.id] += row.classified_by == user_id
+
+            user_deltas = {}
+            durations = {}
+            video_deltas = {}
+            feature_rows = []
+            classified_videos = []
+
+            def add_delta(deltas, key, delta):
+                deltas[key] = deltas.get(key, 0) + delta
+
+            for index, video_id, classification, feature_ids, duration in pending:
+                if video_id not in labels:
+                    results[index] = {"video_id": str(video_id), "error": f"Video {video_id} does not exist."}
+                    continue
+                if not open_entries[video_id]:
+                    results[index] = {
+                        "video_id": str(video_id),
+                        "error": f"User {user_id} does not have an open classification for Video {video_id}."
+                    }
+                    continue
+                open_entries[video_id] -= 1
+
+                # The user's open classification entry for this video. The statements below only change it
+                # while it is still 'N/A', so a repeated submit can't classify it twice.
+                open_entry = session.query(VideoClassification.id).filter(
+                    VideoClassification.video_id == video_id,
+                    VideoClassification.classified_by == user_id,
+                    VideoClassification.classification == "N/A"
+                ).limit(1).scalar_subquery()
+                is_open = (VideoClassification.id == open_entry) & (VideoClassification.classification == "N/A")
+
+                # If classified as 'broken', move the video to broken_videos and delete classification entry
+                if classification.lower() == "broken":
+                    # Delete classification entry from video_classification
+                    session.execute(
+                        delete(VideoClassification).where(is_open),
+                        execution_options={"synchronize_session": False}
+                    )
+
+                    # Insert into broken_videos, unless this user already marked the video as broken
+                    session.execute(pg_insert(BrokenVideos).values(
+                        video_id=video_id, classified_by=user_id
+                    ).on_conflict_do_nothing())
+
+                    add_delta(user_deltas, (user_id, "N/A"), -1)
+                    results[index] = {"video_id": str(video_id), "classified": None}
+                    continue
 
-                # Delete classification entry from video_classification
-                session.delete(classification_entry)
-            else:
                 # Otherwise, update classification from 'N/A' to the user's choice
-                classification_entry.classification = classification
-                classification_entry.duration = duration
-
-                # Save selected features in VideosClassification_Features
-                if features:
-                    self.add_classification_features(classification_entry.id, features, session)
-
-                # Detect if a pro user is needed due to conflict or "uncertain" classification
-                if not self.is_pro_user(user_id):
-                    self.check_if_pro_needed(session, video_id)
+                classification_id = session.execute(
+                    update(VideoClassification).where(is_open).values(
+                        classification=classification, duration=duration, features_mask=feature_mask(feature_ids)
+                    ).returning(VideoClassification.id),
+                    execution_options={"synchronize_session": False}
+                ).scalar_one()
+
+                feature_rows += [
+                    {"classification_id": classification_id, "feature_id": feature_id} for feature_id in feature_ids
+                ]
+
+                add_delta(user_deltas, (user_id, "N/A"), -1)
+                add_delta(user_deltas, (user_id, classification), 1)
+                if duration is not None:
+                    durations.setdefault((user_id, classification), []).append(duration)
+
+                # Count the video once per label, and once overall, the first time it receives them
+                if classification not in labels[video_id]:
+                    add_delta(video_deltas, classification, 1)
+                if not labels[video_id]:
+                    add_delta(video_deltas, VideoLabelCounter.ANY_LABEL, 1)
+                labels[video_id].add(classification)
+
+                classified_videos.append(video_id)
+                results[index] = {
+                    "video_id": str(video_id),
+                    "classified": {"id": classification_id, "video_id": str(video_id), "classification": classification}
+                }
+
+            # Save selected features in VideosClassification_Features with one multi-row insert
+            if feature_rows:
+                session.execute(insert(VideosClassificationFeature), feature_rows)
+
+            self.update_user_counters(session, user_deltas, durations=durations)
+            self.update_video_counters(session, video_deltas)
+
+            # Queue the videos for the pro review check and final label refresh, which run in the background
+            # (process_pro_review_outbox)
+            if classified_videos:
+                session.execute(pg_insert(ProReviewOutbox).values([
+                    {"video_id": video_id} for video_id in sorted(set(classified_videos))
+                ]).on_conflict_do_nothing())
 
             session.commit()
-            return None if classification.lower() == "broken" else classification_entry
 
-    def is_pro_user(self, user_id):
-        with Session(self.engine) as session:
-            return session.query(ProUser).filter(ProUser.id == user_id).one_or_none()
+        return results
 
-    def add_classification_features(self, classification_id, features, session):
+    def get_feature_snapshot(self):
         """
-        Adds the features selected in the classification to the VideosClassification_Features table.
+        Returns the current FeatureSnapshot of the feature catalog, loading it from the Features table
+        if it isn't loaded yet.
         """
-        for feature_id, is_selected in features.items():
-            if is_selected:  # Only add features that are marked as True
-                # Ensure the feature exists in the Features table
-                feature_obj = session.query(Feature).filter(Feature.id == feature_id).one_or_none()
-                if not feature_obj:
-                    raise ValueError(f"Feature with ID '{feature_id}' does not exist.")
-
-                # Insert into VideosClassification_Features table
-                feature_entry = VideosClassificationFeature(
-                    classification_id=classification_id,
-                    feature_id=feature_id
-                )
-                session.add(feature_entry)
+        return self.feature_catalog.snapshot
 
-        session.commit()
+    def reload_feature_catalog(self):
+        """
+        Reloads the feature catalog after the Features table changed. Returns the number of features.
+        """
+        return len(self.feature_catalog.reload().ids)
 
-    def check_if_pro_needed(self, session, video_id):
+    def process_pro_review_outbox(self, batch_size=PRO_REVIEW_BATCH_SIZE):
         """
-        Checks if a video requires a pro classification and assigns it if necessary.
-        Conditions:
-        - Two users have classified it differently.
-        - Any user classified it as 'uncertain'.
+        Drains a batch of ProReviewOutbox: refreshes the videos' final labels, and assigns a pro review to each
+        video that needs one: two users classified it differently, or any user classified it as 'uncertain',
+        and no pro user has been assigned to it yet.
+        Claims the batch with SKIP LOCKED, so several workers can drain the outbox at once, and locks the
+        videos like classify_videos does, so the check sees every classification committed before it.
+        Detection is one grouped query, and the reviews are written with one bulk insert.
+        Returns the number of outbox entries processed.
         """
-        # Get all classifications for this video, excluding 'N/A'
-        classifications = session.query(VideoClassification.classification).filter(
-            VideoClassification.video_id == video_id,
-            VideoClassification.classification != "N/A"
-        ).distinct().all()
+        with Session(self.engine) as session:
+            video_ids = [v[0] for v in session.query(ProReviewOutbox.video_id).order_by(
+                ProReviewOutbox.enqueued_at
+            ).limit(batch_size).with_for_update(skip_locked=True).all()]
 
-        # Flatten classification results
-        classifications = [c[0] for c in classifications]
+            if not video_ids:
+                return 0
 
-        # If there are two different classifications OR 'uncertain' is present
-        if len(classifications) > 1 or "Uncertain" in classifications:
-            # Check if a pro classification already exists
-            pro_entry = session.query(VideoClassification).join(
-                ProUser, VideoClassification.classified_by == ProUser.id
-            ).filter(
-                VideoClassification.video_id == video_id,
-                VideoClassification.classification == "N/A"
-            ).one_or_none()
+            # Lock the videos in id order, like classify_videos, to avoid deadlocks
+            session.query(VideoMeta.id).filter(VideoMeta.id.in_(video_ids)).order_by(VideoMeta.id).with_for_update().all()
 
-            if not pro_entry:
-                # Get all pro user IDs
-                pro_users = session.query(ProUser.id).order_by(ProUser.id).all()
-                pro_users = [p[0] for p in pro_users]  # Convert to list of IDs
+            self.refresh_final_labels(session, video_ids)
 
-                if not pro_users:
+            # Videos with conflicting or 'Uncertain' classifications and no pro user assigned yet
+            label = VideoClassification.classification
+            needs_review = [v[0] for v in session.query(VideoClassification.video_id).outerjoin(
+                ProUser, ProUser.id == VideoClassification.classified_by
+            ).filter(
+                VideoClassification.video_id.in_(video_ids)
+            ).group_by(VideoClassification.video_id).having(
+                ((func.count(label.distinct()).filter(label != "N/A") > 1) | func.bool_or(label == "Uncertain"))
+                & ~func.bool_or(ProUser.id.isnot(None))
+            ).order_by(VideoClassification.video_id).all()]
+
+            if needs_review:
+                pro_users = self.route_pro_reviews(session, len(needs_review))
+                if pro_users:
+                    self.write_assignment_plan(session, list(zip(needs_review, pro_users)))
+                    for video_id, pro_user in zip(needs_review, pro_users):
+                        print(f"Assigned video {video_id} to pro user {pro_user} for review.")
+                else:
                     print("No pro users available.")
-                    return
 
-                next_pro_user = self.next_pro_to_assign(pro_users, session)
+            session.execute(delete(ProReviewOutbox).where(ProReviewOutbox.video_id.in_(video_ids)))
+            session.commit()
+            return len(video_ids)
 
-                # Insert new classification for the pro user
-                pro_classification = VideoClassification(
-                    video_id=video_id,
-                    classified_by=next_pro_user,
-                    classification="N/A"
-                )
-                session.add(pro_classification)
-                session.commit()
-                print(f"Assigned video {video_id} to pro user {next_pro_user} for review.")
-
-    def next_pro_to_assign(self, pro_users, session):
-        # Find the last assigned pro user
-        last_pro_entry = session.query(VideoClassification.classified_by).filter(
-            VideoClassification.classified_by.in_(pro_users)
-        ).order_by(desc(VideoClassification.id)).first()
-        # Determine next pro user using round-robin
-        if last_pro_entry:
-            last_pro_user = last_pro_entry[0]
-            last_pro_index = pro_users.index(last_pro_user) if last_pro_user in pro_users else -1
-            next_pro_user = pro_users[(last_pro_index + 1) % len(pro_users)]
+    def final_label_query(self, session, video_ids=None, rule=FINAL_LABEL_RULE):
+        """
+        Returns a query resolving the final label of each classified video (or only of `video_ids`), as
+        (video_id, classification, classification_id, resolved_by, votes) rows in FinalLabel column order.
+        Open ('N/A') and broken rows are skipped. With the 'pro-override' rule a pro user's label wins;
+        otherwise, and with the 'majority' rule, the label with the most classifications wins.
+        Ties go to the label that was given first.
+        """
+        if rule not in FINAL_LABEL_RULES:
+            raise ValueError(f"Unknown final label rule '{rule}'.")
+
+        # Classifications per video and label
+        is_pro = ProUser.id.isnot(None)
+        votes = session.query(
+            VideoClassification.video_id,
+            VideoClassification.classification,
+            func.count().label("votes"),
+            func.min(VideoClassification.id).label("first_id"),
+            func.bool_or(is_pro).label("by_pro"),
+            func.max(VideoClassification.id).filter(is_pro).label("pro_id")
+        ).outerjoin(
+            ProUser, ProUser.id == VideoClassification.classified_by
+        ).filter(
+            VideoClassification.classification.notin_(["N/A", "Broken"])
+        )
+        if video_ids is not None:
+            votes = votes.filter(VideoClassification.video_id.in_(video_ids))
+        votes = votes.group_by(VideoClassification.video_id, VideoClassification.classification).subquery()
+
+        # The winning label per video, and the classification it is taken from
+        if rule == "pro-override":
+            source_id = case((votes.c.by_pro, votes.c.pro_id), else_=votes.c.first_id)
+            resolved_by = case((votes.c.by_pro, FinalLabel.RESOLVED_BY_PRO), else_=FinalLabel.RESOLVED_BY_MAJORITY)
+            order = [votes.c.video_id, votes.c.by_pro.desc(), votes.c.votes.desc(), votes.c.first_id]
         else:
-            next_pro_user = pro_users[0]  # Start with the first pro user
-        return next_pro_user
+            source_id = votes.c.first_id
+            resolved_by = literal(FinalLabel.RESOLVED_BY_MAJORITY)
+            order = [votes.c.video_id, votes.c.votes.desc(), votes.c.first_id]
+
+        return session.query(
+            votes.c.video_id,
+            votes.c.classification,
+            source_id,
+            resolved_by,
+            votes.c.votes
+        ).distinct(votes.c.video_id).order_by(*order)
+
+    def refresh_final_labels(self, session, video_ids):
+        """
+        Recomputes the final labels of the given videos in the session's transaction.
+        The caller should hold the videos' locks, so no classification of them commits in between.
+        """
+        session.execute(delete(FinalLabel).where(FinalLabel.video_id.in_(video_ids)))
+        session.execute(insert(FinalLabel).from_select(
+            ["video_id", "classification", "classification_id", "resolved_by", "votes"],
+            self.final_label_query(session, video_ids)
+        ))
+
+    def rebuild_final_labels(self):
+        """
+        Recomputes FinalLabel for every video, e.g. after creating the table or changing FINAL_LABEL_RULE.
+        The table is locked first, so refreshes running meanwhile wait and are applied on top of the rebuild.
+        """
+        with Session(self.engine) as session:
+            session.execute(text("LOCK TABLE final_labels IN EXCLUSIVE MODE"))
+            session.execute(delete(FinalLabel))
+            result = session.execute(insert(FinalLabel).from_select(
+                ["video_id", "classification", "classification_id", "resolved_by", "votes"],
+                self.final_label_query(session)
+            ))
+            session.commit()
+            print(f"Rebuilt {result.rowcount} final labels.")
+
+    def route_pro_reviews(self, session, count):
+        """
+        Picks the pro users for `count` new reviews, each going to the pro user with the fewest open reviews
+        according to the maintained counters.
+        Ties (including every pro user having none) are broken round-robin, starting after the last pro user
+        picked, which is persisted in ProRoutingCursor. Locking the cursor row serializes routing across
+        workers, so concurrent picks always see each other's assignments.
+        Returns the list of pro user ids, or an empty list if there are no pro users.
+        """
+        cursor = session.query(ProRoutingCursor).filter(
+            ProRoutingCursor.id == ProRoutingCursor.SINGLETON_ID
+        ).with_for_update().one_or_none()
+        last_pro_user = cursor.last_pro_id if cursor else None
+
+        # Open reviews per pro user, in id order
+        pro_loads = dict(session.query(ProUser.id, func.coalesce(ClassificationCounter.num, 0)).outerjoin(
+            ClassificationCounter,
+            (ClassificationCounter.user_id == ProUser.id) & (ClassificationCounter.classification == "N/A")
+        ).order_by(ProUser.id).all())
+
+        if not pro_loads:
+            return []
+
+        picks = []
+        for _ in range(count):
+            # Among the least loaded pro users, take the first one after the last pick, wrapping around
+            least_load = min(pro_loads.values())
+            candidates = [pro_id for pro_id, load in pro_loads.items() if load == least_load]
+            next_pro_user = next((pro_id for pro_id in candidates
+                                  if last_pro_user is not None and pro_id > last_pro_user), candidates[0])
+            picks.append(next_pro_user)
+            pro_loads[next_pro_user] += 1
+            last_pro_user = next_pro_user
+
+        session.execute(pg_insert(ProRoutingCursor).values(
+            id=ProRoutingCursor.SINGLETON_ID, last_pro_id=last_pro_user
+        ).on_conflict_do_update(
+            index_elements=[ProRoutingCursor.id], set_={"last_pro_id": last_pro_user}
+        ))
+        return picks
+
+    def update_user_counters(self, session, deltas, durations=None):
+        """
+        Applies count changes to ClassificationCounter within the caller's transaction.
+        `deltas` maps (user_id, classification) to the change in count, and `durations` optionally maps
+        the same keys to a list of new classification durations to add to the running duration totals.
+        Rows are upserted in key order, so concurrent updates lock the counter rows in the same order.
+        """
+        durations = durations or {}
+        rows = [{
+            "user_id": user_id,
+            "classification": classification,
+            "num": delta,
+            "duration_sum": sum(durations.get((user_id, classification), [])),
+            "duration_count": len(durations.get((user_id, classification), []))
+        } for (user_id, classification), delta in sorted(deltas.items()) if delta]
+
+        if not rows:
+            return
+
+        stmt = pg_insert(ClassificationCounter).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ClassificationCounter.user_id, ClassificationCounter.classification],
+            set_={
+                "num": ClassificationCounter.num + stmt.excluded.num,
+                "duration_sum": ClassificationCounter.duration_sum + stmt.excluded.duration_sum,
+                "duration_count": ClassificationCounter.duration_count + stmt.excluded.duration_count
+            }
+        )
+        session.execute(stmt)
+
+    def update_video_counters(self, session, deltas):
+        """
+        Applies changes in distinct-video counts to VideoLabelCounter within the caller's transaction.
+        `deltas` maps a classification (or VideoLabelCounter.ANY_LABEL) to the change in count.
+        Rows are upserted in key order, so concurrent updates lock the counter rows in the same order.
+        """
+        rows = [{"classification": label, "num_videos": delta} for label, delta in sorted(deltas.items()) if delta]
+        if not rows:
+            return
+
+        stmt = pg_insert(VideoLabelCounter).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[VideoLabelCounter.classification],
+            set_={"num_videos": VideoLabelCounter.num_videos + stmt.excluded.num_videos}
+        )
+        session.execute(stmt)
+
+    def rebuild_classification_counters(self):
+        """
+        Recomputes ClassificationCounter and VideoLabelCounter from VideosClassification.
+        The counter tables are locked first, so classifications committed during the rebuild are
+        either included in the recount or applied on top of it afterwards.
+        """
+        with Session(self.engine) as session:
+            session.execute(text("LOCK TABLE classification_counters, video_label_counters IN EXCLUSIVE MODE"))
+            session.execute(delete(ClassificationCounter))
+            session.execute(delete(VideoLabelCounter))
+
+            # Per-user counts
+            per_user = session.query(
+                VideoClassification.classified_by,
+                VideoClassification.classification,
+                func.count(),
+                func.coalesce(func.sum(VideoClassification.duration), 0),
+                func.count(VideoClassification.duration)
+            ).filter(
+                VideoClassification.classified_by != None
+            ).group_by(VideoClassification.classified_by, VideoClassification.classification)
+            session.execute(insert(ClassificationCounter).from_select(
+                ["user_id", "classification", "num", "duration_sum", "duration_count"], per_user
+            ))
+
+            # Distinct videos per label, plus the number of videos with any label
+            per_label = session.query(
+                VideoClassification.classification,
+                func.count(func.distinct(VideoClassification.video_id))
+            ).filter(
+                VideoClassification.classification != "N/A"
+            ).group_by(VideoClassification.classification)
+            any_label = session.query(
+                literal(VideoLabelCounter.ANY_LABEL),
+                func.count(func.distinct(VideoClassification.video_id))
+            ).filter(VideoClassification.classification != "N/A")
+            session.execute(insert(VideoLabelCounter).from_select(
+                ["classification", "num_videos"], per_label.union_all(any_label)
+            ))
+
+            session.commit()
+            print("Rebuilt classification counters.")
 
     def get_uploader_username(self, video_id):
         """ Returns the video's uploader username """
@@ -537,6 +871,27 @@ class DBAccess(metaclass=Singleton):
             return session.query(VideoClassification).filter(VideoClassification.classified_by == classifier).filter(
                 VideoClassification.classification != "N/A").count()
 
+    # This method returns all of a user's per-label counts from the maintained counters.
+    def get_user_stats(self, classifier):
+        """
+        Returns the user's classification counts, keyed like the user panel:
+        total (classified), fatah, hamas, unaffiliated, uncertain and remain (still 'N/A').
+        Reads the user's rows in ClassificationCounter, so the cost doesn't grow with the classification history.
+        """
+        with Session(self.engine) as session:
+            counts = dict(session.query(
+                ClassificationCounter.classification, ClassificationCounter.num
+            ).filter(ClassificationCounter.user_id == classifier).all())
+
+        return {
+            "total": sum(num for label, num in counts.items() if label != "N/A"),
+            "fatah": counts.get("Fatah", 0),
+            "hamas": counts.get("Hamas", 0),
+            "unaffiliated": counts.get("Unaffiliated", 0),
+            "uncertain": counts.get("Uncertain", 0),
+            "remain": counts.get("N/A", 0)
+        }
+
     # This method returns the average classification duration for a user, ignoring nulls.
     def get_avg_duration_by_user(self, classifier):
         with Session(self.engine) as session:
@@ -582,66 +937,196 @@ class DBAccess(metaclass=Singleton):
                 .filter(VideoClassification.duration != None) \
                 .scalar()
 
-    def get_final_classifications_with_metadata(self):
+    def get_pro_dashboard(self):
+        """
+        Returns the pro panel data from the maintained counters using two queries instead of several per user:
+        one for the per-user counts and duration totals, and one for the global distinct-video totals.
+        """
+        label = ClassificationCounter.classification
+
+        def num(condition):
+            # FILTER applies to the aggregate itself, not to the coalesce around it
+            return func.coalesce(func.sum(ClassificationCounter.num).filter(condition), 0)
+
         with Session(self.engine) as session:
-            # Define priority: pro users first
-            priority_case = case(
-                (VideoClassification.classified_by.in_([24, 25]), 0),
-                else_=1
-            ).label("priority")
+            # Per-user counts; the outer join keeps users that have no classifications yet
+            user_rows = session.query(
+                User.id,
+                User.email,
+                num(label != "N/A").label("total"),
+                num(label == "Fatah").label("fatah"),
+                num(label == "Hamas").label("hamas"),
+                num(label == "Unaffiliated").label("unaffiliated"),
+                num(label == "Uncertain").label("uncertain"),
+                func.coalesce(func.sum(ClassificationCounter.duration_sum), 0).label("duration_sum"),
+                func.coalesce(func.sum(ClassificationCounter.duration_count), 0).label("duration_count")
+            ).outerjoin(
+                ClassificationCounter, ClassificationCounter.user_id == User.id
+            ).group_by(User.id, User.email).order_by(User.id).all()
+
+            # Global totals count distinct videos per label
+            totals = dict(session.query(VideoLabelCounter.classification, VideoLabelCounter.num_videos).all())
+
+        def avg_duration(duration_sum, duration_count):
+            return round(duration_sum / duration_count, 2) if duration_count else "N/A"
+
+        users = [{
+            "email": row.email,
+            "personalClassifications": row.total,
+            "fatahClassified": row.fatah,
+            "hamasClassified": row.hamas,
+            "unaffiliatedClassified": row.unaffiliated,
+            "uncertainClassified": row.uncertain,
+            "avgDuration": avg_duration(row.duration_sum, row.duration_count)
+        } for row in user_rows]
+
+        return {"users": users,
+                "total": totals.get(VideoLabelCounter.ANY_LABEL, 0),
+                "total_hamas": totals.get("Hamas", 0),
+                "total_fatah": totals.get("Fatah", 0),
+                "total_unaffiliated": totals.get("Unaffiliated", 0),
+                "total_uncertain": totals.get("Uncertain", 0),
+                "total_duration": avg_duration(sum(row.duration_sum for row in user_rows),
+                                               sum(row.duration_count for row in user_rows))}
+
+    def get_agreement_stats(self):
+        """
+        Returns inter-annotator agreement among non-pro users: per-pair confusion matrices with Cohen's kappa,
+        per-user agreement and overall Fleiss' kappa (see db.agreement.agreement_stats).
+        The pairs are counted in SQL by joining the classifications of each video with each other, and the
+        result is cached for AGREEMENT_CACHE_TTL seconds.
+        """
+        stats = self.agreement_cache.get("agreement")
+        if stats is not None:
+            return stats
 
-            # Subquery: all classifications with priority
-            ranked = session.query(
-                VideoClassification.id.label("classification_id"),
-                VideoClassification.video_id,
-                VideoClassification.classification,
-                priority_case
-            ).subquery()
+        with Session(self.engine) as session:
+            first = aliased(VideoClassification)
+            second = aliased(VideoClassification)
+            first_pro = aliased(ProUser)
+            second_pro = aliased(ProUser)
+            skipped = ["N/A", "Broken"]
+
+            # Videos per (user pair, label pair), for every two non-pro users who classified the same video
+            pair_counts = session.query(
+                first.classified_by, second.classified_by, first.classification, second.classification, func.count()
+            ).join(
+                second, (second.video_id == first.video_id) & (second.classified_by > first.classified_by)
+            ).outerjoin(
+                first_pro, first_pro.id == first.classified_by
+            ).outerjoin(
+                second_pro, second_pro.id == second.classified_by
+            ).filter(
+                first_pro.id == None,
+                second_pro.id == None,
+                first.classification.notin_(skipped),
+                second.classification.notin_(skipped)
+            ).group_by(
+                first.classified_by, second.classified_by, first.classification, second.classification
+            ).all()
 
-            # Subquery: final classification per video (pro preferred)
-            final_classification_sub = (
-                session.query(
-                    ranked.c.classification_id,
-                    ranked.c.video_id,
-                    ranked.c.classification
-                )
-                .distinct(ranked.c.video_id)
-                .order_by(ranked.c.video_id, ranked.c.priority)
-                .subquery()
-            )
+            user_ids = {row[0] for row in pair_counts} | {row[1] for row in pair_counts}
+            emails = dict(session.query(User.id, User.email).filter(User.id.in_(user_ids)).all()) if user_ids else {}
 
-            # Aliases
-            vcf_alias = aliased(VideosClassificationFeature)
-            f_alias = aliased(Feature)
-            v_alias = aliased(VideoMeta)
-            u_alias = aliased(TiktokUser)
+        stats = agreement_stats(pair_counts, emails)
+        self.agreement_cache.set("agreement", stats)
+        return stats
 
-            # Final query with joins to features, videos, and users
-            results = (
+    def get_final_classifications_with_metadata(self):
+        """
+        Returns the final classification of every video with its features and metadata, as a list.
+        Exports should use iter_final_classifications, which doesn't hold every row in memory.
+        """
+        return list(self.iter_final_classifications())
+
+    def iter_final_classifications(self, chunk_size=EXPORT_CHUNK_SIZE):
+        """
+        Yields the final classification of every classified video with its features and metadata,
+        in video id order, read from the precomputed FinalLabel table.
+        Rows are streamed from a server-side cursor `chunk_size` at a time, so memory use doesn't grow with
+        the number of videos. Features come from the features_mask of the classification the final label
+        was taken from, named through the feature catalog. If some feature is outside the mask's range,
+        they are aggregated from the VideosClassification_Features join table instead.
+        """
+        mask_complete = self.feature_catalog.mask_complete
+        with Session(self.engine) as session:
+            if mask_complete:
+                features = func.coalesce(VideoClassification.features_mask, 0)
+            else:
+                features = session.query(
+                    func.string_agg(Feature.title, aggregate_order_by(literal(", "), Feature.id))
+                ).join(
+                    VideosClassificationFeature, VideosClassificationFeature.feature_id == Feature.id
+                ).filter(
+                    VideosClassificationFeature.classification_id == FinalLabel.classification_id
+                ).scalar_subquery()
+
+            rows = (
                 session.query(
-                    final_classification_sub.c.video_id,
-                    final_classification_sub.c.classification.label("final_classification"),
-                    func.coalesce(func.string_agg(f_alias.title, ', '), '').label("features"),
-                    v_alias.music_id,
-                    u_alias.username,
-                    v_alias.description
-                )
-                .outerjoin(vcf_alias, vcf_alias.classification_id == final_classification_sub.c.classification_id)
-                .outerjoin(f_alias, f_alias.id == vcf_alias.feature_id)
-                .join(v_alias, v_alias.id == final_classification_sub.c.video_id)
-                .join(u_alias, u_alias.id == v_alias.user_id)
-                .group_by(
-                    final_classification_sub.c.video_id,
-                    final_classification_sub.c.classification,
-                    v_alias.music_id,
-                    u_alias.username,
-                    v_alias.description
+                    FinalLabel.video_id,
+                    FinalLabel.classification.label("final_classification"),
+                    features.label("features"),
+                    VideoMeta.music_id,
+                    TiktokUser.username,
+                    VideoMeta.description
                 )
-                .order_by(final_classification_sub.c.video_id)
-                .all()
+                .outerjoin(VideoClassification, VideoClassification.id == FinalLabel.classification_id)
+                .join(VideoMeta, VideoMeta.id == FinalLabel.video_id)
+                .join(TiktokUser, TiktokUser.id == VideoMeta.user_id)
+                .order_by(FinalLabel.video_id)
+                .yield_per(chunk_size)
             )
 
-            return results
+            for row in rows:
+                yield FinalClassification(
+                    video_id=row.video_id,
+                    final_classification=row.final_classification,
+                    features=(", ".join(self.feature_catalog.titles_for_mask(row.features)) if mask_complete
+                              else row.features or ""),
+                    music_id=row.music_id,
+                    username=row.username,
+                    description=row.description
+                )
+
+    def get_feature_counts(self):
+        """
+        Returns how many videos have each feature in their final classification, per final label,
+        as {classification: {feature title: count}}. Counted from the features_mask of the classification
+        each final label was taken from, with one bitwise sum per feature. If some feature is outside the mask's
+        range, they are counted from the VideosClassification_Features join table instead.
+        """
+        features = self.feature_catalog.params
+        if not self.feature_catalog.mask_complete:
+            with Session(self.engine) as session:
+                rows = session.query(
+                    FinalLabel.classification,
+                    VideosClassificationFeature.feature_id,
+                    func.count()
+                ).join(
+                    VideosClassificationFeature,
+                    VideosClassificationFeature.classification_id == FinalLabel.classification_id
+                ).group_by(FinalLabel.classification, VideosClassificationFeature.feature_id).all()
+
+            counts = {}
+            for label, feature_id, count in rows:
+                counts.setdefault(label, {title: 0 for _, title in features})
+                title = self.feature_catalog.title(feature_id)
+                if title is not None:
+                    counts[label][title] = count
+            return counts
+
+        with Session(self.engine) as session:
+            rows = session.query(
+                FinalLabel.classification,
+                *[func.sum(case((VideoClassification.features_mask.op("&")(feature_bit(feature_id)) != 0, 1), else_=0))
+                  for feature_id, _ in features]
+            ).join(
+                VideoClassification, VideoClassification.id == FinalLabel.classification_id
+            ).filter(
+                VideoClassification.features_mask != 0
+            ).group_by(FinalLabel.classification).all()
+
+        return {row[0]: {title: count for (_, title), count in zip(features, row[1:])} for row in rows}
 
     def get_classification_map_by_user(self):
         with Session(self.engine) as session:
@@ -654,7 +1139,8 @@ class DBAccess(metaclass=Singleton):
                     func.count().label("count")
                 )
                 .join(User, User.id == VideoClassification.classified_by)
-                .filter(~VideoClassification.classified_by.in_([24, 25]))  # exclude pro users
+                .outerjoin(ProUser, ProUser.id == VideoClassification.classified_by)
+                .filter(ProUser.id == None)  # exclude pro users
                 .group_by(User.id, VideoClassification.classified_by, VideoClassification.classification)
                 .all()
             )
@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+
+def cohen_kappa(confusion):
+    """
+    Returns (items, observed agreement, Cohen's kappa) of a confusion matrix given as
+    {(label_a, label_b): count}, where label_a is the first annotator's label and label_b the second's.
+    Kappa is None when chance agreement is total (both annotators always gave the same single label).
+    """
+    items = sum(confusion.values())
+    if not items:
+        return 0, None, None
+
+    first, second = defaultdict(int), defaultdict(int)
+    agreed = 0
+    for (label_a, label_b), count in confusion.items():
+        first[label_a] += count
+        second[label_b] += count
+        if label_a == label_b:
+            agreed += count
+
+    observed = agreed / items
+    expected = sum(first[label] * second[label] for label in first) / items ** 2
+    kappa = (observed - expected) / (1 - expected) if expected < 1 else None
+    return items, observed, kappa
+
+
+def fleiss_kappa(confusion):
+    """
+    Returns Fleiss' kappa over items rated by two annotators each, from the pooled confusion counts
+    {(label_a, label_b): count}. Unlike Cohen's kappa, the annotators aren't told apart:
+    chance agreement comes from the overall label proportions.
+    """
+    items = sum(confusion.values())
+    if not items:
+        return None
+
+    proportions = defaultdict(float)
+    agreed = 0
+    for (label_a, label_b), count in confusion.items():
+        proportions[label_a] += count / (2 * items)
+        proportions[label_b] += count / (2 * items)
+        if label_a == label_b:
+            agreed += count
+
+    observed = agreed / items
+    expected = sum(p * p for p in proportions.values())
+    return (observed - expected) / (1 - expected) if expected < 1 else None
+
+
+def agreement_stats(pair_counts, emails=None):
+    """
+    Summarizes annotator agreement from `pair_counts`: (user_a, user_b, label_a, label_b, videos) rows
+    counting the videos both users classified, with user_a < user_b.
+    Returns the per-pair confusion matrices with Cohen's kappa, each user's agreement with the others,
+    and the overall agreement with Fleiss' kappa (every pair of classifications of a video is one item).
+    """
+    emails = emails or {}
+    pairs = defaultdict(dict)
+    users = defaultdict(lambda: defaultdict(int))
+    overall = defaultdict(int)
+    labels = set()
+
+    for user_a, user_b, label_a, label_b, count in pair_counts:
+        pairs[(user_a, user_b)][(label_a, label_b)] = count
+        # Each user's labels against the other annotator's
+        users[user_a][(label_a, label_b)] += count
+        users[user_b][(label_b, label_a)] += count
+        overall[(label_a, label_b)] += count
+        labels.update((label_a, label_b))
+
+    def summary(confusion):
+        items, observed, kappa = cohen_kappa(confusion)
+        return {"videos": items, "observed_agreement": round_stat(observed), "cohen_kappa": round_stat(kappa)}
+
+    pair_stats = []
+    for (user_a, user_b), confusion in sorted(pairs.items()):
+        confusion_matrix = {label_a: {} for label_a, _ in confusion}
+        for (label_a, label_b), count in confusion.items():
+            confusion_matrix[label_a][label_b] = count
+        pair_stats.append({"users": [user_a, user_b], "emails": [emails.get(user_a), emails.get(user_b)],
+                           **summary(confusion), "confusion": confusion_matrix})
+
+    user_stats = [{"user_id": user, "email": emails.get(user), **summary(confusion)}
+                  for user, confusion in sorted(users.items())]
+
+    items, observed, _ = cohen_kappa(overall)
+    return {
+        "labels": sorted(labels),
+        "overall": {"items": items, "observed_agreement": round_stat(observed),
+                    "fleiss_kappa": round_stat(fleiss_kappa(overall))},
+        "pairs": pair_stats,
+        "users": user_stats
+    }
+
+
+def round_stat(value):
+    return None if value is None else round(value, 4)
@@ -0,0 +1,194 @@
+import heapq
+import random
+from array import array
+from collections import namedtuple
+
+# Options shared by all assignment strategies; each strategy uses the ones relevant to it:
+# quota - new videos per user (or, for balance-by-workload, open videos per user to top up to)
+# pre_class - the uploader pre-classification to prioritize or restrict to
+# limit - maximum number of prioritized videos
+# exclude - user ids that don't receive videos
+AssignmentOptions = namedtuple("AssignmentOptions", ["quota", "pre_class", "limit", "exclude"],
+                               defaults=[10, "hamas", None, ()])
+
+
+class AssignmentPool:
+    """
+    The inputs of an assignment round, loaded once: the videos assigned to fewer than two users with their
+    uploaders' pre-classifications and current assignees, and the non-pro users with their open workload.
+    Videos are held in compact parallel arrays, addressed by their position.
+    """
+
+    def __init__(self, candidates, users, workloads):
+        """
+        `candidates` are (video_id, assigned_user_ids, pre_classification) rows,
+        `users` the user ids that can receive videos, and `workloads` maps a user id to their open assignments.
+        """
+        self.video_ids = array('q')
+        self.assigned_counts = array('b')
+        self.pre_class_codes = array('b')
+        self.pre_classes = []  # Pre-classification label of each code
+        self.assignees = {}  # Position -> assigned user ids, only for videos that are already assigned
+        self.users = list(users)
+        self.workloads = {user: workloads.get(user, 0) for user in self.users}
+
+        codes = {}
+        for video_id, assigned, pre_classification in candidates:
+            if pre_classification not in codes:
+                codes[pre_classification] = len(self.pre_classes)
+                self.pre_classes.append(pre_classification)
+
+            if assigned:
+                self.assignees[len(self.video_ids)] = frozenset(assigned)
+            self.video_ids.append(video_id)
+            self.assigned_counts.append(len(assigned))
+            self.pre_class_codes.append(codes[pre_classification])
+
+    def positions(self, pre_class=None, unassigned_only=False):
+        """ Returns the positions of the videos, optionally only unassigned ones or ones with this pre-classification. """
+        code = self.pre_classes.index(pre_class) if pre_class in self.pre_classes else -1
+        return [position for position in range(len(self.video_ids))
+                if (not unassigned_only or self.assigned_counts[position] == 0)
+                and (pre_class is None or self.pre_class_codes[position] == code)]
+
+    def videos(self, positions):
+        """ Returns (video_id, assigned_user_ids) for the given positions, as plan_assignments expects. """
+        return [(self.video_ids[position], self.assignees.get(position, frozenset())) for position in positions]
+
+
+def plan_assignments(videos, users, max_videos_per_user, copies=2, quotas=None, rng=random):
+    """
+    Plans which users each video is assigned to, spreading the new assignments evenly across users.
+
+    `videos` is a list of (video_id, assigned_user_ids) in the order the videos should be considered,
+    where assigned_user_ids are the users the video is already assigned to. Each video is given further
+    users until it has `copies` of them, and each user receives at most `max_videos_per_user` new videos,
+    or their own quota if `quotas` maps them to one.
+    Users are kept in a heap keyed by their remaining quota, with random tie-breaking, so each video
+    goes to the users with the most room left. Once only one user has room, videos are given to that
+    user alone until their quota is reached.
+
+    Runs in O((videos + assignments) * log(users)) without touching the database.
+    Returns the plan as a list of (video_id, user_id) pairs.
+    """
+    quotas = quotas or {}
+    heap = [(-quotas.get(user, max_videos_per_user), rng.random(), user) for user in users]
+    heap = [entry for entry in heap if entry[0] < 0]
+    heapq.heapify(heap)
+
+    plan = []
+    for video_id, assigned in videos:
+        if not heap:
+            break  # Stop if no users need more videos
+
+        needed = copies - len(assigned)
+        if needed <= 0:
+            continue  # Skip already fully assigned videos
+
+        # Take the users with the most remaining quota, skipping users that already have this video
+        picked, skipped = [], []
+        while heap and len(picked) < needed:
+            entry = heapq.heappop(heap)
+            (skipped if entry[2] in assigned else picked).append(entry)
+
+        for neg_remaining, _, user in picked:
+            plan.append((video_id, user))
+            if neg_remaining + 1 < 0:
+                heapq.heappush(heap, (neg_remaining + 1, rng.random(), user))
+
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+
+    return plan
+
+
+def random_two_way(pool, options, rng=random):
+    """
+    Assigns videos in random order so each has two users, giving every user up to `quota` new videos.
+    If needed, some videos are assigned to only one user to reach the quota.
+    """
+    positions = pool.positions()
+    rng.shuffle(positions)
+    users = [user for user in pool.users if user not in options.exclude]
+    return plan_assignments(pool.videos(positions), users, options.quota, rng=rng)
+
+
+def priority_by_pre_class(pool, options, rng=random):
+    """
+    Assigns unassigned videos to two users each, first up to `limit` videos whose uploader is pre-classified
+    as `pre_class`, then the others in random order, giving every user up to `quota` new videos.
+    """
+    positions = pool.positions(unassigned_only=True)
+    rng.shuffle(positions)
+    code = pool.pre_classes.index(options.pre_class) if options.pre_class in pool.pre_classes else -1
+
+    prioritized = [position for position in positions if pool.pre_class_codes[position] == code][:options.limit]
+    prioritized_set = set(prioritized)
+    others = [position for position in positions if position not in prioritized_set]
+
+    users = [user for user in pool.users if user not in options.exclude]
+    return plan_assignments(pool.videos(prioritized + others), users, options.quota, rng=rng)
+
+
+def round_robin(pool, options, rng=random):
+    """
+    Assigns every unassigned video whose uploader is pre-classified as `pre_class` to exactly two different
+    users, going round-robin over the users that aren't excluded.
+    """
+    positions = pool.positions(pre_class=options.pre_class, unassigned_only=True)
+    rng.shuffle(positions)
+    users = [user for user in pool.users if user not in options.exclude]
+    rng.shuffle(users)
+
+    if len(users) < 2:
+        print("Not enough users to assign each video to two users.")
+        return []
+
+    plan = []
+    for idx, position in enumerate(positions):
+        # Pick two different users using round-robin
+        plan.append((pool.video_ids[position], users[(2 * idx) % len(users)]))
+        plan.append((pool.video_ids[position], users[(2 * idx + 1) % len(users)]))
+    return plan
+
+
+def balance_by_workload(pool, options, rng=random):
+    """
+    Assigns videos in random order so each has two users, topping every user up to `quota` open assignments:
+    users with a smaller backlog of unclassified videos receive more new ones.
+    """
+    positions = pool.positions()
+    rng.shuffle(positions)
+    users = [user for user in pool.users if user not in options.exclude]
+    quotas = {user: options.quota - pool.workloads[user] for user in users}
+    return plan_assignments(pool.videos(positions), users, options.quota, quotas=quotas, rng=rng)
+
+
+# Assignment strategies by name. Each takes an AssignmentPool and AssignmentOptions and returns a plan.
+STRATEGIES = {
+    "random-2-way": random_two_way,
+    "priority-by-pre-class": priority_by_pre_class,
+    "round-robin": round_robin,
+    "balance-by-workload": balance_by_workload,
+}
+
+
+def group_plan_by_user(plan, users=()):
+    """
+    Returns the plan as a map of user id to the list of video ids planned for them.
+    Users without new videos are included with an empty list.
+    """
+    user_video_map = {user: [] for user in users}
+    for video_id, user in plan:
+        user_video_map.setdefault(user, []).append(video_id)
+    return user_video_map
+
+
+def print_plan_summary(plan, users=(), dry_run=False):
+    """ Prints how many videos and assignments the plan contains, and the new videos per user. """
+    user_video_map = group_plan_by_user(plan, users)
+    prefix = "[dry run] " if dry_run else ""
+    print(f"{prefix}{len(plan)} assignments of {len({video_id for video_id, _ in plan})} videos "
+          f"among {len(user_video_map)} users.")
+    for user, videos in user_video_map.items():
+        print(f"{prefix}User {user}: {len(videos)} videos")
@@ -0,0 +1,45 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from credentials import DB_POOL_SIZE, DB_MAX_OVERFLOW
+from db.access import DBAccess, Singleton
+
+# Threads running database calls; matches the engine's pool capacity,
+# so queries queue here instead of waiting for a connection while holding a thread
+DB_EXECUTOR_WORKERS = DB_POOL_SIZE + DB_MAX_OVERFLOW
+
+
+class AsyncDBAccess(metaclass=Singleton):
+    """
+    Asynchronous front for DBAccess for use in the API's async endpoints.
+    Every DBAccess method is available as a coroutine function with the same arguments,
+    run on a bounded thread pool so blocking queries don't stall the event loop.
+    """
+
+    def __init__(self):
+        self.db = DBAccess()
+        self.executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db")
+
+    async def run(self, func, *args, **kwargs):
+        """ Runs a blocking function on the database thread pool. """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def get_authenticated_user(self, user_id):
+        # Cache hits are served on the event loop; only misses need a database thread
+        user = self.db.user_cache.get(user_id)
+        if user is not None:
+            return user
+        return await self.run(self.db.load_authenticated_user, user_id)
+
+    def __getattr__(self, name):
+        attr = getattr(self.db, name)
+        if not callable(attr):
+            return attr
+
+        async def method(*args, **kwargs):
+            return await self.run(attr, *args, **kwargs)
+
+        method.__name__ = name
+        return method
@@ -1,10 +1,21 @@
+import argparse
 import glob
 import json
 import os
 import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
 from dotenv import load_dotenv
 
 import psycopg2
+from psycopg2.extras import execute_values
+
+try:
+    import ijson  # Optional: faster incremental parsing of JSON array files
+except ImportError:
+    ijson = None
 
 # Load environment variables from .env file
 load_dotenv()
@@ -16,6 +27,30 @@ DB_CONFIG = {
     "password": os.getenv("DB_PASSWORD"),
 }
 
+# Define AWS S3 bucket details
+BUCKET_NAME = "tiktok-project-storage"
+AWS_REGION = "eu-north-1"
+VIDEO_FOLDER = "videos/downloads/"
+
+BATCH_SIZE = 1000  # Records written per transaction by the bulk mode
+HASHTAG_MAX_LENGTH = 100  # Length of Hashtags.content
+READ_CHUNK_SIZE = 1 << 20  # Characters read at a time when streaming a JSON array without ijson
+WRITERS = 4  # Writer connections of the parallel driver
+QUEUED_BATCHES_PER_WRITER = 2  # Parsed batches waiting per writer before the parsers pause
+BATCH_RETRIES = 3  # Extra attempts for a batch that fails to write, e.g. on a deadlock or a dropped connection
+RETRY_DELAY = 1.0  # Seconds before the first retry, doubled for each further one
+
+# Columns written by the bulk mode, in the order normalize_record produces them
+USER_COLUMNS = ["id", "username", "nickname", "description", "region", "video_num", "fans", "following",
+                "friends", "likes", "thumbnail", "pre_classification"]
+MUSIC_COLUMNS = ["id", "name", "author", "play_link"]
+VIDEO_COLUMNS = ["id", "description", "user_id", "play_count", "share_count", "comment_count", "created_at",
+                 "duration", "height", "width", "video_file", "video_thumbnail", "web_url", "music_id"]
+
+# Columns with a database default, used when the scrape has no value (the per-record mode omits them instead)
+COLUMN_DEFAULTS = {"video_num": 0, "fans": 0, "following": 0, "friends": 0, "likes": 0,
+                   "play_count": 0, "share_count": 0, "comment_count": 0}
+
 def insert_tiktok_data(data, pre_class):
     """
     Inserts TikTok data into the PostgreSQL database.
@@ -49,23 +84,6 @@ def insert_tiktok_data(data, pre_class):
     except Exception as db_error:
         print(f"❌ Database connection error: {db_error}")
 
-def insert_hashtags(cur, hashtags):
-    hashtag_ids = []
-    for hashtag in hashtags:
-        cur.execute("""
-                    INSERT INTO Hashtags (content)
-                    VALUES (%s)
-                    ON CONFLICT (content) DO NOTHING
-                    RETURNING id
-                """, (hashtag["name"],))
-        result = cur.fetchone()
-        if result:
-            hashtag_ids.append(result[0])
-        else:
-            cur.execute("SELECT id FROM Hashtags WHERE name = %s", (hashtag,))
-            hashtag_ids.append(cur.fetchone()[0])
-    return hashtag_ids
-
 def insert_data(cur, table, data):
     # Prepare the columns and values for the INSERT statement
     columns = list(data.keys())
@@ -142,14 +160,8 @@ def insert_video(cur, data):
     # Insert hashtags and get their IDs
     hashtag_ids = insert_hashtags(cur, data.get("hashtags", []))
 
-    # Define AWS S3 bucket details
-    BUCKET_NAME = "tiktok-project-storage"
-    AWS_REGION = "eu-north-1"
-    VIDEO_FOLDER = "videos/downloads/"
-
     # Generate AWS S3 URL using the video ID
-    video_id = data.get("id")
-    video_url = f"https://{BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{VIDEO_FOLDER}{video_id}.mp4"
+    video_url = video_file_url(data.get("id"))
 
     # Prepare video data
     video_data = {
@@ -185,12 +197,488 @@ def insert_video(cur, data):
             """
         cur.execute(query, (video_data["id"], hashtag_id))
 
-def load_tiktok_json(file_path):
+def video_file_url(video_id):
+    """
+    Returns the AWS S3 URL of a downloaded video.
+    """
+    return f"https://{BUCKET_NAME}.s3.{AWS_REGION}.amazonaws.com/{VIDEO_FOLDER}{video_id}.mp4"
+
+def is_skipped_record(record):
+    return "note" in record and record["note"] in ('Profile is private', 'No videos found to match the date filter')
+
+def with_defaults(columns, data):
+    return tuple(COLUMN_DEFAULTS.get(col) if data.get(col) is None else data.get(col) for col in columns)
+
+def normalize_record(record, pre_class):
+    """
+    Turns a scraped record into the rows the bulk mode writes: (user, music, video, hashtag names),
+    with user, music and video as tuples in USER_COLUMNS, MUSIC_COLUMNS and VIDEO_COLUMNS order.
+    Music is None when the record has no usable music. Returns None for records without a video.
+    Raises KeyError if the record has no author data.
+    """
+    if is_skipped_record(record) or record.get("id") is None:
+        return None
+
+    author = record["authorMeta"]
+    user = with_defaults(USER_COLUMNS, {
+        "id": author["id"],
+        "username": author["name"],
+        "nickname": author["nickName"],
+        "description": author["signature"],
+        "region": author["region"],
+        "video_num": author["video"],
+        "fans": author["fans"],
+        "following": author["following"],
+        "friends": author["friends"],
+        "likes": author["heart"],
+        "thumbnail": author["avatar"],
+        "pre_classification": pre_class
+    })
+
+    # Music needs an id and a name; a video without usable music is stored without one
+    music_meta = record.get("musicMeta", {})
+    music = None
+    if music_meta.get("musicId") is not None and music_meta.get("musicName") is not None:
+        music = with_defaults(MUSIC_COLUMNS, {
+            "id": music_meta.get("musicId"),
+            "name": music_meta.get("musicName"),
+            "author": music_meta.get("musicAuthor"),
+            "play_link": music_meta.get("playUrl")
+        })
+
+    video_meta = record.get("videoMeta", {})
+    video = with_defaults(VIDEO_COLUMNS, {
+        "id": record["id"],
+        "description": record.get("text"),
+        "user_id": author["id"],
+        "play_count": record.get("playCount"),
+        "share_count": record.get("shareCount"),
+        "comment_count": record.get("commentCount"),
+        "created_at": record.get("createTimeISO"),
+        "duration": video_meta.get("duration"),
+        "height": video_meta.get("height"),
+        "width": video_meta.get("width"),
+        "video_file": video_file_url(record["id"]),
+        "video_thumbnail": video_meta.get("coverUrl"),
+        "web_url": record.get("webVideoUrl"),
+        "music_id": music[0] if music else None
+    })
+
+    # Hashtags longer than the Hashtags.content column can't be stored
+    hashtags = [hashtag["name"] for hashtag in record.get("hashtags", [])
+                if hashtag.get("name") and len(hashtag["name"]) <= HASHTAG_MAX_LENGTH]
+    return user, music, video, hashtags
+
+def upsert_rows(cur, table, columns, rows):
+    """
+    Inserts the rows with one multi-row statement, keeping existing rows (like the per-record mode).
+    Returns the number of new rows.
+    """
+    if not rows:
+        return 0
+    execute_values(cur, f"""
+        INSERT INTO {table} ({', '.join(columns)})
+        VALUES %s
+        ON CONFLICT (id) DO NOTHING
+    """, rows, page_size=len(rows))
+    return cur.rowcount
+
+def resolve_hashtags(cur, names):
+    """
+    Inserts the missing hashtags and returns a map of content to id for all of them, with one statement.
+    The no-op update makes RETURNING include the hashtags that already existed.
+    Names are sorted so that concurrent loaders lock them in the same order.
+    """
+    if not names:
+        return {}
+    cur.execute("""
+        INSERT INTO Hashtags (content)
+        SELECT unnest(%s::text[])
+        ON CONFLICT (content) DO UPDATE SET content = EXCLUDED.content
+        RETURNING id, content
+    """, (sorted(set(names)),))
+    return {content: hashtag_id for hashtag_id, content in cur.fetchall()}
+
+class HashtagDictionary:
+    """
+    Ingestion-side map of Hashtags.content to id, preloaded once and shared by the writers of a run,
+    so only hashtags not seen before reach the database, in one statement per batch.
+    Ids of new hashtags are added with remember() once their batch is committed, so a rolled back
+    batch can't leave ids of hashtags that don't exist.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self._lock = threading.Lock()
+
+    def preload(self, cur):
+        cur.execute("SELECT content, id FROM Hashtags")
+        rows = cur.fetchall()
+        with self._lock:
+            self.ids.update(rows)
+        print(f"Preloaded {len(rows)} hashtags.")
+
+    def resolve(self, cur, names):
+        """
+        Returns (map of content to id for `names`, map of the hashtags that weren't known yet).
+        """
+        with self._lock:
+            known = {name: self.ids[name] for name in names if name in self.ids}
+        new = resolve_hashtags(cur, [name for name in names if name not in known])
+        known.update(new)
+        return known, new
+
+    def remember(self, new):
+        with self._lock:
+            self.ids.update(new)
+
+def write_batch(cur, rows, hashtags):
+    """
+    Writes a batch of normalized records set-wise: users, music and videos with one statement each,
+    the hashtags missing from the `hashtags` dictionary with one INSERT ... ON CONFLICT ... RETURNING,
+    and the video-hashtag links with one multi-row insert.
+    Returns (rows written per table, hashtags new to the dictionary); the caller passes the latter to
+    hashtags.remember() after committing.
+    """
+    users, music, videos, links = {}, {}, {}, set()
+    for user, music_row, video, video_hashtags in rows:
+        users.setdefault(user[0], user)
+        if music_row:
+            music.setdefault(music_row[0], music_row)
+        videos.setdefault(video[0], video)
+        links.update((video[0], name) for name in video_hashtags)
+
+    # Rows are written in key order, so concurrent writers lock them in the same order
+    written = {
+        "users": upsert_rows(cur, "TiktokUsers", USER_COLUMNS, [users[key] for key in sorted(users)]),
+        "music": upsert_rows(cur, "Music", MUSIC_COLUMNS, [music[key] for key in sorted(music)]),
+        "videos": upsert_rows(cur, "VideosMeta", VIDEO_COLUMNS, [videos[key] for key in sorted(videos)]),
+        "hashtag_links": 0
+    }
+    if not links:
+        return written, {}
+
+    hashtag_ids, new_hashtags = hashtags.resolve(cur, {name for _, name in links})
+    execute_values(cur, """
+        INSERT INTO VideosMeta_Hashtags (video_id, hashtag_id)
+        VALUES %s
+        ON CONFLICT DO NOTHING
+    """, sorted({(video_id, hashtag_ids[name]) for video_id, name in links}), page_size=len(links))
+    written["hashtag_links"] = cur.rowcount
+    return written, new_hashtags
+
+def normalize_batch(batch, pre_class, totals):
+    """
+    Normalizes a batch of records, counting the skipped ones in `totals`.
+    """
+    rows = []
+    for record in batch:
+        try:
+            row = normalize_record(record, pre_class)
+        except (KeyError, TypeError) as record_error:
+            print(f"❌ Error reading video {record.get('id', 'UNKNOWN')}: {record_error}")
+            row = None
+        if row is None:
+            totals["skipped"] += 1
+        else:
+            rows.append(row)
+    return rows
+
+def rollback_or_close(conn):
+    """
+    Rolls back a failed transaction, closing the connection if that fails too, so the next attempt reconnects.
+    """
+    if not conn.closed:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            conn.close()
+
+def write_batch_with_retry(conn, rows, hashtags, retries=BATCH_RETRIES):
+    """
+    Writes a batch in its own transaction.
+    Transient errors (a lost connection, a deadlock or a serialization failure) are retried up to `retries` times
+    with a growing delay, reconnecting if needed. Any other database error comes from the data, so the batch
+    is split in halves until the failing records are isolated; those are reported and skipped.
+    Returns (connection, rows written per table, number of skipped records), with None instead of the counts
+    if a transient error outlasted every retry.
+    """
+    for attempt in range(retries + 1):
+        try:
+            if conn.closed:
+                conn = psycopg2.connect(**DB_CONFIG)
+            with conn.cursor() as cur:
+                written, new_hashtags = write_batch(cur, rows, hashtags)
+            conn.commit()
+            hashtags.remember(new_hashtags)
+            return conn, written, 0
+        except psycopg2.OperationalError as batch_error:
+            rollback_or_close(conn)
+            print(f"❌ Error inserting batch of {len(rows)} records (attempt {attempt + 1}/{retries + 1}): {batch_error}")
+            if attempt < retries:
+                time.sleep(RETRY_DELAY * 2 ** attempt)
+        except psycopg2.Error as data_error:
+            rollback_or_close(conn)
+            if len(rows) == 1:
+                print(f"❌ Skipping video {rows[0][2][0]}: {data_error}")
+                return conn, {}, 1
+
+            # Write each half on its own, to find the records that fail
+            middle = len(rows) // 2
+            conn, first, first_skipped = write_batch_with_retry(conn, rows[:middle], hashtags, retries)
+            conn, second, second_skipped = write_batch_with_retry(conn, rows[middle:], hashtags, retries)
+            if first is None or second is None:
+                return conn, None, first_skipped + second_skipped
+            return conn, {table: first.get(table, 0) + second.get(table, 0)
+                          for table in first.keys() | second.keys()}, first_skipped + second_skipped
+    return conn, None, 0
+
+def file_marker(file_path):
+    """
+    Returns the resume marker key of a file: its name and size, so a file that was replaced is loaded again.
+    """
+    return os.path.basename(file_path), os.path.getsize(file_path)
+
+def get_ingested_files(conn):
     """
-    Loads TikTok data from a JSON file.
+    Returns the markers of the files that were completely loaded by earlier runs.
     """
-    with open(file_path, "r") as f:
-        return json.load(f)
+    with conn.cursor() as cur:
+        cur.execute("SELECT file_name, file_size FROM Ingested_Files")
+        return set(cur.fetchall())
+
+def mark_file_ingested(conn, file_path, records):
+    file_name, file_size = file_marker(file_path)
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO Ingested_Files (file_name, file_size, records)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (file_name) DO UPDATE
+            SET file_size = EXCLUDED.file_size, records = EXCLUDED.records, ingested_at = now()
+        """, (file_name, file_size, records))
+    conn.commit()
+
+def parse_file(file_path, batch_size, queue):
+    """
+    Parser process of the parallel driver: streams a file, normalizes its records and puts them on `queue`
+    as ("batch", file_path, rows) items, followed by ("done", file_path, batches, skipped).
+    A file that can't be read ends with ("error", file_path, message) instead.
+    """
+    pre_class = extract_group(file_path)
+    totals = {"skipped": 0}
+    batches = 0
+    try:
+        for batch in iter_batches(iter_tiktok_records(file_path), batch_size):
+            rows = normalize_batch(batch, pre_class, totals)
+            if rows:
+                queue.put(("batch", file_path, rows))
+                batches += 1
+    except Exception as file_error:
+        queue.put(("error", file_path, str(file_error)))
+        return
+    queue.put(("done", file_path, batches, totals["skipped"]))
+
+class IngestionProgress:
+    """
+    Tracks the batches of each file across the writer threads of the parallel driver,
+    and reports each file once all of its batches have been written.
+    """
+
+    def __init__(self, file_paths):
+        self._lock = threading.Lock()
+        self.files = {file_path: {"batches": None, "written": 0, "failed": 0, "records": 0, "skipped": 0,
+                                  "rejected": 0, "error": None, "reported": False, "start": time.perf_counter()}
+                      for file_path in file_paths}
+
+    def batch_written(self, file_path, records, written, rejected):
+        with self._lock:
+            progress = self.files[file_path]
+            progress["rejected"] += rejected
+            if written is None:
+                progress["failed"] += 1
+            else:
+                progress["written"] += 1
+                progress["records"] += records - rejected
+            print(f"{os.path.basename(file_path)}: {progress['written']}/{progress['batches'] or '?'} batches written, "
+                  f"{progress['records']} records")
+            return self._finish(file_path)
+
+    def file_parsed(self, file_path, batches, skipped, error=None):
+        with self._lock:
+            progress = self.files[file_path]
+            progress["batches"], progress["skipped"], progress["error"] = batches, skipped, error
+            return self._finish(file_path)
+
+    def _finish(self, file_path):
+        """
+        Returns True if the file was completely loaded, once, when its last batch is accounted for.
+        """
+        progress = self.files[file_path]
+        if progress["reported"] or progress["batches"] is None \
+                or progress["written"] + progress["failed"] < progress["batches"]:
+            return False
+
+        elapsed = time.perf_counter() - progress["start"]
+        name = os.path.basename(file_path)
+        if progress["error"]:
+            print(f"❌ {name}: could not be read: {progress['error']}")
+        elif progress["failed"]:
+            print(f"❌ {name}: {progress['failed']} of {progress['batches']} batches failed, "
+                  f"it will be loaded again by the next run")
+        else:
+            print(f"✅ {name}: {progress['records']} records ({progress['skipped']} skipped, "
+                  f"{progress['rejected']} rejected by the database) in {elapsed:.1f}s, "
+                  f"{progress['records'] / max(elapsed, 1e-9):.0f} records/s")
+        progress["reported"] = True
+        return not progress["error"] and not progress["failed"]
+
+def write_batches(conn, queue, progress, hashtags):
+    """
+    Writer thread of the parallel driver: writes the batches on `queue` with its own connection
+    until it receives None, and marks each file as ingested once it is completely loaded.
+    """
+    try:
+        while True:
+            item = queue.get()
+            if item is None:
+                break
+
+            kind, file_path = item[0], item[1]
+            if kind == "batch":
+                conn, written, rejected = write_batch_with_retry(conn, item[2], hashtags)
+                finished = progress.batch_written(file_path, len(item[2]), written, rejected)
+            elif kind == "done":
+                finished = progress.file_parsed(file_path, item[2], item[3])
+            else:
+                finished = progress.file_parsed(file_path, 0, 0, error=item[2])
+
+            if finished:
+                try:
+                    mark_file_ingested(conn, file_path, progress.files[file_path]["records"])
+                except psycopg2.Error as marker_error:
+                    conn.rollback()
+                    print(f"❌ Could not mark {file_path} as loaded: {marker_error}")
+    finally:
+        conn.close()
+
+def ingest_files(file_paths, workers=None, writers=WRITERS, batch_size=BATCH_SIZE, resume=True):
+    """
+    Loads the files in parallel: a process pool of `workers` parsers streams and normalizes them into
+    batches on a bounded queue, and `writers` threads with their own connections bulk-load the batches.
+    Failed batches are retried. Files completely loaded by an earlier run are skipped unless `resume` is False;
+    files with a failed batch aren't marked, so the next run loads them again.
+    """
+    hashtags = HashtagDictionary()
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        ingested = get_ingested_files(conn) if resume else set()
+        pending = [file_path for file_path in file_paths if file_marker(file_path) not in ingested]
+        if len(pending) < len(file_paths):
+            print(f"Skipping {len(file_paths) - len(pending)} files loaded by an earlier run.")
+        if not pending:
+            return
+
+        with conn.cursor() as cur:
+            hashtags.preload(cur)
+    finally:
+        conn.close()
+
+    start = time.perf_counter()
+    progress = IngestionProgress(pending)
+    with Manager() as manager:
+        queue = manager.Queue(maxsize=writers * QUEUED_BATCHES_PER_WRITER)
+        # Connect before parsing starts, so a connection error doesn't leave the parsers blocked on the queue
+        connections = [psycopg2.connect(**DB_CONFIG) for _ in range(writers)]
+        threads = [threading.Thread(target=write_batches, args=(conn, queue, progress, hashtags))
+                   for conn in connections]
+        for thread in threads:
+            thread.start()
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(parse_file, file_path, batch_size, queue) for file_path in pending]:
+                future.result()
+
+        for _ in threads:
+            queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    records = sum(file_progress["records"] for file_progress in progress.files.values())
+    elapsed = time.perf_counter() - start
+    print(f"Loaded {records} records from {len(pending)} files in {elapsed:.1f}s "
+          f"({records / max(elapsed, 1e-9):.0f} records/s)")
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """
+    Yields the elements of the JSON array in file `f` one at a time, reading it in chunks,
+    so memory use is bounded by the largest element rather than the file.
+    """
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r"[\s,]*")  # Separators between elements
+    spaces = re.compile(r"\s*")
+    buffer, pos, eof, started = "", 0, False, False
+    while True:
+        if not started:
+            stripped = buffer.lstrip()
+            if stripped.startswith("["):
+                buffer, pos, started = stripped[1:], 0, True
+                continue
+            if stripped:
+                raise ValueError(f"{f.name} does not contain a JSON array")
+        else:
+            pos = whitespace.match(buffer, pos).end()
+            if buffer.startswith("]", pos):
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = None  # The next element isn't complete yet: read more of the file
+
+            # An element is only complete once the "," or "]" after it has been read: a number like
+            # "1." or "1.5e" decodes as a prefix of the next chunk's digits
+            if end is not None:
+                after = spaces.match(buffer, end).end()
+                end = end if after < len(buffer) and buffer[after] in ",]" else None
+            if end is not None:
+                yield element
+                pos = end
+                continue
+
+        if eof:
+            raise ValueError(f"{f.name} is not a complete JSON array")
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+def iter_tiktok_records(file_path):
+    """
+    Yields the TikTok records of a file one at a time: one JSON object per line for .jsonl/.ndjson files,
+    otherwise the elements of the file's JSON array, parsed incrementally (with ijson if it is installed).
+    """
+    if file_path.endswith((".jsonl", ".ndjson")):
+        with open(file_path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif ijson is not None:
+        with open(file_path, "rb") as f:
+            yield from ijson.items(f, "item", use_float=True)
+    else:
+        with open(file_path, "r", encoding="utf-8") as f:
+            yield from iter_json_array(f)
+
+def iter_batches(records, batch_size):
+    """
+    Groups an iterable of records into lists of at most `batch_size` records.
+    """
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
 def extract_group(filename):
     match = re.search(r'dataset_(hamas|fatah|none)', filename)
@@ -199,22 +687,34 @@ def extract_group(filename):
     return 'unknown'
 
 if __name__ == "__main__":
-    # Directory containing TikTok JSON files
-    tiktok_json_directory = "../tiktok_data/"
-
-    # Iterate through all JSON files in the directory
-    for file_path in glob.glob(os.path.join(tiktok_json_directory, "*.json")):
-        print(f"Processing file: {file_path}")
+    parser = argparse.ArgumentParser(description="Load TikTok scrape files into the database")
+    parser.add_argument("directory", nargs="?", default="../tiktok_data/",
+                        help="Directory containing TikTok JSON files")
+    parser.add_argument("--per-record", action="store_true",
+                        help="Insert and commit one record at a time, one file after the other")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Records per bulk batch")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes (default: one per CPU)")
+    parser.add_argument("--writers", type=int, default=WRITERS, help="Writer connections")
+    parser.add_argument("--no-resume", action="store_true", help="Also load files loaded by an earlier run")
+    args = parser.parse_args()
+
+    # All JSON and JSON Lines files in the directory
+    file_paths = sorted(path for pattern in ("*.json", "*.jsonl", "*.ndjson")
+                        for path in glob.glob(os.path.join(args.directory, pattern)))
+
+    if not args.per_record:
+        ingest_files(file_paths, workers=args.workers, writers=args.writers, batch_size=args.batch_size,
+                     resume=not args.no_resume)
+    else:
+        for file_path in file_paths:
+            print(f"Processing file: {file_path}")
 
-        try:
-            # Extract pre_classification from the file name
-            pre_classification = extract_group(file_path)
-
-            # Load the JSON data from the file
-            tiktok_data = load_tiktok_json(file_path)
+            try:
+                # Extract pre_classification from the file name
+                pre_classification = extract_group(file_path)
 
-            # Insert data into the database
-            insert_tiktok_data(tiktok_data, pre_classification)
+                # Insert data into the database
+                insert_tiktok_data(iter_tiktok_records(file_path), pre_classification)
 
-        except Exception as e:
-            print(f"Error processing file {file_path}: {e}")
\ No newline at end of file
+            except Exception as e:
+                print(f"Error processing file {file_path}: {e}")
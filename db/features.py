@@ -0,0 +1,128 @@
+import hashlib
+import json
+import time
+from collections import namedtuple
+from threading import Lock
+
+from sqlalchemy.orm import Session
+
+from db.models import Feature
+
+CATALOG_TTL = 60  # Seconds before the catalog is reloaded, so changes reach every worker process
+MASK_FEATURE_IDS = 31  # Feature ids 1-31 fit in the INTEGER features_mask column of VideosClassification
+
+
+def in_mask(feature_id):
+    """ Returns whether a feature id has a bit in features_mask. """
+    return 1 <= feature_id <= MASK_FEATURE_IDS
+
+
+def feature_bit(feature_id):
+    """ Returns the features_mask bit of a feature id, which must be in the mask's range. """
+    return 1 << (feature_id - 1)
+
+
+def feature_mask(feature_ids):
+    """
+    Returns the features_mask value for the given feature ids.
+    Ids outside the mask's range are left out: the VideosClassification_Features join table is authoritative.
+    """
+    mask = 0
+    for feature_id in feature_ids:
+        if in_mask(feature_id):
+            mask |= feature_bit(feature_id)
+    return mask
+
+
+# An immutable version of the catalog, swapped as a whole on reload so readers never see a partial one
+FeatureSnapshot = namedtuple("FeatureSnapshot", ["titles", "ids", "params", "etag", "mask_complete", "loaded_at"])
+
+
+class FeatureCatalog:
+    """
+    The classification features of the Features table, kept in memory and reloaded every `ttl` seconds:
+    an id -> title map, the frozen set of valid ids, the (id, title) list served by /params_list and its ETag,
+    and whether every feature fits in features_mask, so readers know when the mask alone is enough.
+    Incoming features are validated against it without a query, except that an unknown id reloads it once.
+    reload() applies a change to the table right away, but only in the calling process.
+    """
+
+    def __init__(self, engine, ttl=CATALOG_TTL):
+        self.engine = engine
+        self.ttl = ttl
+        self._snapshot = None
+        self._lock = Lock()
+
+    @property
+    def snapshot(self):
+        """ Returns the current snapshot, loading the catalog on first use and once it is older than `ttl`. """
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - snapshot.loaded_at > self.ttl:
+            with self._lock:
+                if self._snapshot is snapshot:
+                    self._snapshot = self._load()
+                snapshot = self._snapshot
+        return snapshot
+
+    def reload(self):
+        """ Reloads the catalog from the Features table, returning the new snapshot. """
+        snapshot = self._load()
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def _load(self):
+        with Session(self.engine) as session:
+            rows = session.query(Feature.id, Feature.title).order_by(Feature.id).all()
+
+        params = [(feature_id, title) for feature_id, title in rows]
+        etag = hashlib.sha256(json.dumps(params, ensure_ascii=False).encode("utf-8")).hexdigest()[:32]
+        return FeatureSnapshot(titles=dict(params), ids=frozenset(feature_id for feature_id, _ in params),
+                               params=params, etag=f'"{etag}"',
+                               mask_complete=all(in_mask(feature_id) for feature_id, _ in params),
+                               loaded_at=time.monotonic())
+
+    @property
+    def ids(self):
+        return self.snapshot.ids
+
+    @property
+    def params(self):
+        return self.snapshot.params
+
+    @property
+    def etag(self):
+        return self.snapshot.etag
+
+    @property
+    def mask_complete(self):
+        return self.snapshot.mask_complete
+
+    def title(self, feature_id):
+        return self.snapshot.titles.get(feature_id)
+
+    def titles_for_mask(self, mask):
+        """ Returns the titles of the features set in a features_mask, in id order. """
+        return [title for feature_id, title in self.snapshot.params
+                if in_mask(feature_id) and mask & feature_bit(feature_id)]
+
+    def selected_ids(self, features):
+        """
+        Returns the sorted, distinct ids of the features marked as selected in a classification's features dict,
+        raising a ValueError if any of them isn't in the catalog.
+        """
+        selected = set()
+        for feature_id, is_selected in (features or {}).items():
+            if is_selected:  # Only add features that are marked as True
+                try:
+                    selected.add(int(feature_id))
+                except ValueError:
+                    raise ValueError(f"Feature with ID '{feature_id}' does not exist.")
+
+        # Reload once in case a feature was added after the catalog was loaded
+        unknown = selected - self.snapshot.ids
+        if unknown:
+            unknown -= self.reload().ids
+        if unknown:
+            raise ValueError(f"Feature with ID '{min(unknown)}' does not exist.")
+        return sorted(selected)
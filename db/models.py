@@ -1,6 +1,6 @@
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, Date, Boolean, ForeignKey, BigInteger, Text, DateTime
+from sqlalchemy import Column, Integer, String, Date, Boolean, ForeignKey, BigInteger, Text, DateTime, Float, Index, text
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -11,7 +11,9 @@ class User(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String(255), unique=True, nullable=False)
-    password = Column(String(255), nullable=False)
+    password = Column(String(255)) # Plaintext access code, cleared once migrated to password_hash
+    password_lookup = Column(String(64), index=True) # HMAC-SHA256 of the access code, used to find the user
+    password_hash = Column(String(60)) # bcrypt hash of the access code
 
     def __repr__(self):
         return f"<User(id={self.id}, email={self.email})>"
@@ -44,6 +46,14 @@ class VideoClassification(Base):
     classification = Column(String(50), nullable=False) # Classification result
     classified_by = Column(Integer, ForeignKey('users.id'))
     duration = Column(Integer) # Time it took to classify the video in seconds
+    queue_position = Column(Float, nullable=False, server_default=text("random()")) # Random ordinal in the user's work queue
+    features_mask = Column(Integer, nullable=False, server_default=text("0")) # Selected features with ids 1-31, bit (id - 1) per feature id
+
+    __table_args__ = (
+        # Open assignments per user, ordered by their queue position
+        Index('ix_videosclassification_open_queue', 'classified_by', 'queue_position',
+              postgresql_where=text("classification = 'N/A'")),
+    )
 
     def __repr__(self):
         return f"<VideoClassification(id={self.id}, video_id={self.video_id}, classification={self.classification})>"
@@ -136,4 +146,82 @@ class BrokenVideos(Base):
     __tablename__ = "broken_videos"
 
     video_id = Column(BigInteger, ForeignKey('videosmeta.id'), primary_key=True)
-    classified_by = Column(BigInteger, ForeignKey('users.id'), primary_key=True)
\ No newline at end of file
+    classified_by = Column(BigInteger, ForeignKey('users.id'), primary_key=True)
+
+# Running count of a user's classifications per label (including open 'N/A' assignments),
+# maintained by DBAccess alongside every write to VideoClassification
+class ClassificationCounter(Base):
+    __tablename__ = 'classification_counters'
+
+    user_id = Column(Integer, ForeignKey('users.id'), primary_key=True)
+    classification = Column(String(50), primary_key=True)
+    num = Column(Integer, nullable=False, default=0)
+    duration_sum = Column(BigInteger, nullable=False, default=0) # Sum of the recorded classification durations
+    duration_count = Column(Integer, nullable=False, default=0) # Number of classifications with a recorded duration
+
+    def __repr__(self):
+        return f"<ClassificationCounter(user_id={self.user_id}, classification={self.classification}, num={self.num})>"
+
+# Number of distinct videos that received each label; the row keyed ANY_LABEL counts videos with any label
+class VideoLabelCounter(Base):
+    __tablename__ = 'video_label_counters'
+
+    ANY_LABEL = '*'
+
+    classification = Column(String(50), primary_key=True)
+    num_videos = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<VideoLabelCounter(classification={self.classification}, num_videos={self.num_videos})>"
+
+# Remembers the last pro user picked for a review, to route reviews round-robin between equally loaded pro users.
+# Holds a single row.
+class ProRoutingCursor(Base):
+    __tablename__ = 'pro_routing_cursor'
+
+    SINGLETON_ID = 1
+
+    id = Column(Integer, primary_key=True)
+    last_pro_id = Column(Integer, ForeignKey('users.id', ondelete='SET NULL'))
+
+    def __repr__(self):
+        return f"<ProRoutingCursor(last_pro_id={self.last_pro_id})>"
+
+# Newly classified videos, waiting for the background pro review check and final label refresh
+class ProReviewOutbox(Base):
+    __tablename__ = 'pro_review_outbox'
+
+    video_id = Column(BigInteger, ForeignKey('videosmeta.id', ondelete='CASCADE'), primary_key=True)
+    enqueued_at = Column(DateTime, nullable=False, server_default=text("now()"))
+
+    def __repr__(self):
+        return f"<ProReviewOutbox(video_id={self.video_id})>"
+
+# Scrape files completely loaded by insert_data.py, so later runs skip them
+class IngestedFile(Base):
+    __tablename__ = 'ingested_files'
+
+    file_name = Column(Text, primary_key=True)
+    file_size = Column(BigInteger, nullable=False)
+    records = Column(Integer, nullable=False)
+    ingested_at = Column(DateTime, nullable=False, server_default=text("now()"))
+
+    def __repr__(self):
+        return f"<IngestedFile(file_name={self.file_name}, records={self.records})>"
+
+# The resolved final label of each classified video, kept up to date by DBAccess.refresh_final_labels
+class FinalLabel(Base):
+    __tablename__ = 'final_labels'
+
+    RESOLVED_BY_PRO = 'pro'
+    RESOLVED_BY_MAJORITY = 'majority'
+
+    video_id = Column(BigInteger, ForeignKey('videosmeta.id', ondelete='CASCADE'), primary_key=True)
+    classification = Column(String(50), nullable=False)
+    classification_id = Column(Integer, ForeignKey('videosclassification.id', ondelete='SET NULL')) # Row whose features are used
+    resolved_by = Column(String(20), nullable=False) # RESOLVED_BY_PRO or RESOLVED_BY_MAJORITY
+    votes = Column(Integer, nullable=False) # Classifications with the final label
+    updated_at = Column(DateTime, nullable=False, server_default=text("now()"))
+
+    def __repr__(self):
+        return f"<FinalLabel(video_id={self.video_id}, classification={self.classification})>"
@@ -0,0 +1,59 @@
+import time
+from threading import Lock
+
+from sqlalchemy.pool import QueuePool
+
+
+class TimedQueuePool(QueuePool):
+    """
+    QueuePool that records how long each connection checkout takes, including the time spent
+    waiting for a free connection when the pool is exhausted.
+    Checkouts slower than `slow_checkout` seconds are logged.
+    """
+
+    def __init__(self, *args, slow_checkout=1.0, **kw):
+        super().__init__(*args, **kw)
+        self.slow_checkout = slow_checkout
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.slow_checkouts = 0
+        self._stats_lock = Lock()
+
+    def recreate(self):
+        # Keep the slow checkout threshold when the engine recreates the pool
+        pool = super().recreate()
+        pool.slow_checkout = self.slow_checkout
+        return pool
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self._record_wait(time.perf_counter() - start)
+
+    def _record_wait(self, wait):
+        with self._stats_lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            if wait >= self.slow_checkout:
+                self.slow_checkouts += 1
+
+        if wait >= self.slow_checkout:
+            print(f"Slow DB connection checkout: waited {wait:.2f}s ({self.status()})")
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                "overflow": self.overflow(),
+                "max_overflow": self._max_overflow,
+                "checkouts": self.checkouts,
+                "avg_wait_ms": round(1000 * self.total_wait / self.checkouts, 2) if self.checkouts else None,
+                "max_wait_ms": round(1000 * self.max_wait, 2),
+                "slow_checkouts": self.slow_checkouts
+            }
@@ -1,10 +1,35 @@
+"""
+Assigns videos to non-pro users for classification, using one of the strategies in db.assignment.
+
+Examples:
+    python -m utils.assign_videos random-2-way --quota 200 --dry-run
+    python -m utils.assign_videos priority-by-pre-class --quota 200 --limit 500 --pre-class hamas
+    python -m utils.assign_videos round-robin --pre-class hamas --exclude 18
+    python -m utils.assign_videos balance-by-workload --quota 200
+"""
+import argparse
+
 from db import access
+from db.assignment import AssignmentOptions, STRATEGIES
+
 
-db = access.DBAccess()
-num_videos = 200
+def main():
+    parser = argparse.ArgumentParser(description="Assign videos to users for classification")
+    parser.add_argument("strategy", choices=STRATEGIES, help="How to choose videos and users")
+    parser.add_argument("--quota", type=int, default=200,
+                        help="New videos per user (balance-by-workload: open videos per user to top up to)")
+    parser.add_argument("--pre-class", default="hamas",
+                        help="Uploader pre-classification to prioritize or restrict to")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum number of prioritized videos")
+    parser.add_argument("--exclude", type=int, nargs="*", default=[], help="User ids that don't receive videos")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan summary without writing it")
+    args = parser.parse_args()
 
-# db.assign_videos_to_users(num_videos)
+    db = access.DBAccess()
+    options = AssignmentOptions(quota=args.quota, pre_class=args.pre_class, limit=args.limit,
+                                exclude=tuple(args.exclude))
+    db.run_assignment_strategy(args.strategy, options, dry_run=args.dry_run)
 
-# db.assign_videos_prioritizing_hamas(200, 500)
 
-db.assign_remaining_hamas_videos([18])
+if __name__ == "__main__":
+    main()
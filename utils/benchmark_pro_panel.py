@@ -0,0 +1,54 @@
+import time
+
+from sqlalchemy import event
+
+from db.access import DBAccess
+
+
+class QueryCounter:
+    """ Counts the statements sent to the database while it is active. """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def legacy_pro_panel(db):
+    """ The per-user loop the pro panel used before get_pro_dashboard. """
+    totals = [db.get_total_classifications(), db.get_total_fatah_classifications(),
+              db.get_total_hamas_classifications(), db.get_total_unaffiliated_classifications(),
+              db.get_total_uncertain_classifications(), db.get_total_avg_duration()]
+    users = []
+    for user in db.get_all_users():
+        users.append([db.get_num_classifications(user.id), db.get_num_fatah_by_user(user.id),
+                      db.get_num_hamas_by_user(user.id), db.get_num_unaffiliated_by_user(user.id),
+                      db.get_num_uncertain_by_user(user.id), db.get_avg_duration_by_user(user.id)])
+    return users, totals
+
+
+def measure(name, engine, func):
+    with QueryCounter(engine) as counter:
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+    print(f"{name}: {counter.count} queries, {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    db = DBAccess()
+    num_users = len(db.get_all_users())
+    print(f"Benchmarking the pro panel with {num_users} users")
+
+    measure("per-user loop", db.engine, lambda: legacy_pro_panel(db))
+    measure("get_pro_dashboard", db.engine, db.get_pro_dashboard)
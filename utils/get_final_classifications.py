@@ -1,31 +1,76 @@
+import argparse
 import csv
+from collections import Counter
+from itertools import islice
+
 from db import access
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-def export_summary_to_csv(output_path="final_classification/classification_summary.csv"):
-    db = access.DBAccess()
-    rows = db.get_final_classifications_with_metadata()
+EXPORT_COLUMNS = ["video_id", "final_classification", "features", "username", "description", "music_id"]
 
-    with open(output_path, mode='w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(["video_id", "final_classification", "features", "username","description","music_id"])
-        for row in rows:
-            writer.writerow([
-                row.video_id,
-                row.final_classification,
-                row.features,
-                row.username,
-                row.description,
-                row.music_id
-            ])
+
+def iter_chunks(rows, chunk_size):
+    """ Groups an iterable of rows into lists of at most `chunk_size` rows. """
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+def export_summary(output_path, write_chunk, chunk_size=access.EXPORT_CHUNK_SIZE):
+    """
+    Streams the final classifications in chunks to `write_chunk`, so memory use doesn't grow with the corpus.
+    Returns the number of videos per final classification, counted while streaming, for plot_bar_chart.
+    """
+    db = access.DBAccess()
+    label_counts = Counter()
+    for chunk in iter_chunks(db.iter_final_classifications(chunk_size), chunk_size):
+        write_chunk(chunk)
+        label_counts.update(row.final_classification for row in chunk)
 
     print(f"Exported to {output_path}")
+    return label_counts
 
-def plot_bar_chart(df):
+
+def export_summary_to_csv(output_path="final_classification/classification_summary.csv",
+                          chunk_size=access.EXPORT_CHUNK_SIZE):
+    with open(output_path, mode='w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(EXPORT_COLUMNS)
+
+        def write_chunk(chunk):
+            writer.writerows([getattr(row, name) for name in EXPORT_COLUMNS] for row in chunk)
+
+        return export_summary(output_path, write_chunk, chunk_size)
+
+
+def export_summary_to_parquet(output_path="final_classification/classification_summary.parquet",
+                              chunk_size=access.EXPORT_CHUNK_SIZE):
+    """ Like export_summary_to_csv, writing one Parquet row group per chunk. Requires pyarrow. """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("video_id", pa.int64()),
+        ("final_classification", pa.string()),
+        ("features", pa.string()),
+        ("username", pa.string()),
+        ("description", pa.string()),
+        ("music_id", pa.int64())
+    ])
+    with pq.ParquetWriter(output_path, schema) as writer:
+        def write_chunk(chunk):
+            columns = {name: [getattr(row, name) for row in chunk] for name in EXPORT_COLUMNS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+
+        return export_summary(output_path, write_chunk, chunk_size)
+
+def plot_bar_chart(label_counts):
+    """ Plots the number of videos per final classification, from the counts returned by the export. """
+    labels, counts = zip(*label_counts.most_common()) if label_counts else ((), ())
     plt.figure(figsize=(8, 5))
-    ax = sns.countplot(data=df, x='final_classification', order=df['final_classification'].value_counts().index)
+    ax = sns.barplot(x=list(labels), y=list(counts))
     plt.title("Number of Videos by Final Classification")
     plt.xlabel("Classification")
     plt.ylabel("Count")
@@ -43,22 +88,17 @@ def plot_bar_chart(df):
     plt.savefig("final_classification/classification_bar_chart.png")
     plt.close()
 
-def plot_feature_distribution_for_classification(df, classification_label, output_path=None):
+def plot_feature_distribution_for_classification(feature_counts, classification_label, output_path=None):
     """
-    Plots a bar chart showing the top N feature counts for a given classification.
+    Plots a bar chart showing the feature counts for a given classification.
 
     Parameters:
-        df (pd.DataFrame): The full classification summary dataframe
+        feature_counts (dict): Feature title -> count, as returned by DBAccess.get_feature_counts for the label
         classification_label (str): e.g., 'Hamas', 'Fatah'
         output_path (str): Optional path to save the image
     """
-    # Filter by classification
-    df_filtered = df[df['final_classification'] == classification_label].copy()
-    df_filtered['features'] = df_filtered['features'].fillna('')
-    df_filtered = df_filtered.assign(feature=df_filtered['features'].str.split(', ')).explode('feature')
-
-    # Count features
-    feature_counts = df_filtered['feature'].value_counts()
+    feature_counts = pd.Series(feature_counts, dtype=int)
+    feature_counts = feature_counts[feature_counts > 0].sort_values(ascending=False)
 
     if feature_counts.empty:
         print(f"No features found for classification: {classification_label}")
@@ -145,10 +185,18 @@ def get_users_classification_map():
 
 
 if __name__ == "__main__":
-    export_summary_to_csv()
-    # Load the CSV
-    df = pd.read_csv("final_classification/classification_summary.csv")
-    plot_bar_chart(df)
-    plot_feature_distribution_for_classification(df, "Hamas", output_path="final_classification/features_hamas.png")
-    plot_feature_distribution_for_classification(df, "Fatah", output_path="final_classification/features_fatah.png")
+    parser = argparse.ArgumentParser(description="Export the final classifications and plot them")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv", help="Export file format")
+    args = parser.parse_args()
+
+    if args.format == "parquet":
+        label_counts = export_summary_to_parquet()
+    else:
+        label_counts = export_summary_to_csv()
+    plot_bar_chart(label_counts)
+    feature_counts = access.DBAccess().get_feature_counts()
+    plot_feature_distribution_for_classification(feature_counts.get("Hamas", {}), "Hamas",
+                                                 output_path="final_classification/features_hamas.png")
+    plot_feature_distribution_for_classification(feature_counts.get("Fatah", {}), "Fatah",
+                                                 output_path="final_classification/features_fatah.png")
     get_users_classification_map()
@@ -0,0 +1,64 @@
+"""
+Measures /get_video and /classify_video throughput against a running server at increasing concurrency.
+Each iteration fetches the user's next video and classifies it, so run it only against a staging
+database, with the token of a test user that has enough assigned videos.
+
+It has not been run yet: there are no measured numbers, so the throughput gain of running
+database calls off the event loop is unverified.
+
+Example:
+    python -m utils.load_test --url http://localhost:8000 --token <jwt> --levels 1 4 16 --requests 200
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def annotate_once(session, url, token, label):
+    headers = {"Authorization": f"Bearer {token}"}
+    video = session.get(f"{url}/get_video", headers=headers).json()
+    if "id" not in video:
+        return False
+
+    session.post(f"{url}/classify_video", headers=headers, json={
+        "classification": label,
+        "video_id": video["id"],
+        "features": {},
+        "duration": 1
+    }).raise_for_status()
+    return True
+
+
+def run_level(url, token, label, concurrency, num_requests):
+    """ Runs `num_requests` get+classify iterations on `concurrency` threads and returns requests per second. """
+    sessions = [requests.Session() for _ in range(concurrency)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(
+            lambda i: annotate_once(sessions[i % concurrency], url, token, label), range(num_requests)
+        ))
+    elapsed = time.perf_counter() - start
+
+    done = sum(results)
+    # Every completed iteration is two requests
+    return done, 2 * done / elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test /get_video and /classify_video")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="JWT of a test user")
+    parser.add_argument("--label", default="Unaffiliated", help="Classification submitted for every video")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=100, help="Iterations per concurrency level")
+    args = parser.parse_args()
+
+    for level in args.levels:
+        done, throughput = run_level(args.url, args.token, args.label, level, args.requests)
+        print(f"concurrency {level:>3}: {done} videos classified, {throughput:.1f} requests/s")
+        if done < args.requests:
+            print("The test user ran out of assigned videos.")
+            break
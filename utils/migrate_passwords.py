@@ -0,0 +1,6 @@
+from db import access
+
+# Moves existing users from plaintext access codes to the indexed lookup key and bcrypt hash.
+# Run once after adding the password_lookup and password_hash columns.
+db = access.DBAccess()
+db.migrate_password_hashes()
@@ -0,0 +1,6 @@
+from db import access
+
+# Recounts classification_counters and video_label_counters from videosclassification.
+# Run after creating the counter tables, or whenever the counters need to be reconciled.
+db = access.DBAccess()
+db.rebuild_classification_counters()
@@ -0,0 +1,6 @@
+from db import access
+
+# Recomputes final_labels from videosclassification with the configured FINAL_LABEL_RULE.
+# Run after creating the table or changing the rule; afterwards it is refreshed as classifications change.
+db = access.DBAccess()
+db.rebuild_final_labels()
@@ -0,0 +1,78 @@
+"""
+Stress test for concurrent classifications of the same video.
+
+For each given video, assigns it to every given (non-pro) user, classifies it from all of them at once
+with conflicting labels, drains the pro review outbox from several workers at once,
+and checks that exactly one pro review was assigned.
+It writes classifications, so run it only against a staging database.
+
+It has not been run yet, so the database-level concurrency control of classify_video is unverified under load.
+
+Example:
+    python -m utils.stress_classify --videos 7311 7312 7313 --users 3 4 5 6
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.orm import Session
+
+from db.access import DBAccess
+from db.models import ProUser, VideoClassification
+
+LABELS = ["Hamas", "Fatah", "Unaffiliated", "Uncertain"]
+
+
+def assign_video(db, video_id, user_ids):
+    with Session(db.engine) as session:
+        for user_id in user_ids:
+            session.add(VideoClassification(video_id=video_id, classified_by=user_id, classification="N/A"))
+        db.update_user_counters(session, {(user_id, "N/A"): 1 for user_id in user_ids})
+        session.commit()
+
+
+def count_pro_assignments(db, video_id):
+    with Session(db.engine) as session:
+        return session.query(VideoClassification).join(
+            ProUser, ProUser.id == VideoClassification.classified_by
+        ).filter(VideoClassification.video_id == video_id).count()
+
+
+def classify_concurrently(db, video_id, user_ids):
+    def classify(i):
+        return db.classify_video(video_id, user_ids[i], LABELS[i % len(LABELS)], {}, 1)
+
+    with ThreadPoolExecutor(max_workers=len(user_ids)) as pool:
+        return list(pool.map(classify, range(len(user_ids))))
+
+
+def drain_outbox_concurrently(db, workers):
+    def drain(_):
+        while db.process_pro_review_outbox():
+            pass
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(drain, range(workers)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent classification stress test")
+    parser.add_argument("--videos", type=int, nargs="+", required=True, help="Unassigned videos to use")
+    parser.add_argument("--users", type=int, nargs="+", required=True, help="Non-pro users to classify as")
+    args = parser.parse_args()
+
+    if len(args.users) < 2:
+        parser.error("At least two users are needed to create a conflict.")
+
+    db = DBAccess()
+    failures = 0
+    for video_id in args.videos:
+        assign_video(db, video_id, args.users)
+        classify_concurrently(db, video_id, args.users)
+        drain_outbox_concurrently(db, len(args.users))
+
+        pro_assignments = count_pro_assignments(db, video_id)
+        status = "ok" if pro_assignments == 1 else "FAILED"
+        failures += pro_assignments != 1
+        print(f"Video {video_id}: {pro_assignments} pro assignments ({status})")
+
+    print(f"{len(args.videos) - failures}/{len(args.videos)} videos got exactly one pro assignment.")